@@ -0,0 +1,37 @@
+"""Per-side indexes for call history lookups
+
+Revision ID: add_call_log_indexes_001
+Revises: add_cleanup_indexes_001
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+
+
+revision = 'add_call_log_indexes_001'
+down_revision = 'add_cleanup_indexes_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index call_logs by each participant, ordered by start_time.
+
+    Built CONCURRENTLY so call_logs stays writable; that cannot run inside
+    a transaction, hence the autocommit block.
+    """
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_call_logs_caller_time "
+            "ON call_logs (caller_id, start_time)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_call_logs_receiver_time "
+            "ON call_logs (receiver_id, start_time)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_call_logs_receiver_time")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_call_logs_caller_time")
@@ -0,0 +1,48 @@
+"""Partial indexes for the background cleanup jobs
+
+Revision ID: add_cleanup_indexes_001
+Revises: add_verification_system_001
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+
+
+revision = 'add_cleanup_indexes_001'
+down_revision = 'add_verification_system_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index only the rows the cleanup jobs look at.
+
+    Built CONCURRENTLY so the messages/users tables stay writable; that
+    cannot run inside a transaction, hence the autocommit block.
+    """
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_expires_at_partial "
+            "ON messages (expires_at) WHERE expires_at IS NOT NULL"
+        )
+        # Superseded by the partial index above
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_messages_expires_at")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_deleted_at_partial "
+            "ON users (deleted_at) WHERE deleted_at IS NOT NULL"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_signed_prekey_timestamp "
+            "ON users (signed_prekey_timestamp)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_signed_prekey_timestamp")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_deleted_at_partial")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_expires_at "
+            "ON messages (expires_at)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_messages_expires_at_partial")
@@ -9,6 +9,7 @@ from typing import List, Optional
 from pydantic import BaseModel
 
 from app.db.database import get_db, User, Contact
+from app.models._config import RESPONSE_CONFIG
 from app.api.routes.auth import oauth2_scheme
 from app.core.security import decode_access_token
 
@@ -28,8 +29,7 @@ class ContactResponse(BaseModel):
     is_verified: bool = False
     added_at: str
     
-    class Config:
-        from_attributes = True
+    model_config = RESPONSE_CONFIG
 
 
 class ContactCreate(BaseModel):
@@ -250,44 +250,21 @@ async def get_key_bundle(
         )
     
     # AUDIT FIX: Atomic prekey consumption to prevent race condition.
-    # Uses SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL) to ensure
-    # two concurrent requests never consume the same prekey.
-    from sqlalchemy import text
-    from datetime import datetime as dt
-    
-    otpk_value = None
-    try:
-        # Try atomic approach first (PostgreSQL)
-        one_time_prekey = db.query(OneTimePreKey)\
-            .filter(
-                OneTimePreKey.user_id == user.id,
-                OneTimePreKey.is_used == False
-            )\
-            .with_for_update(skip_locked=True)\
-            .first()
-    except Exception:
-        # Fallback for SQLite (no FOR UPDATE support)
-        one_time_prekey = db.query(OneTimePreKey)\
-            .filter(
-                OneTimePreKey.user_id == user.id,
-                OneTimePreKey.is_used == False
-            )\
-            .first()
-    
-    if one_time_prekey:
-        otpk_value = one_time_prekey.public_key
-        one_time_prekey.is_used = True
-        one_time_prekey.used_at = dt.utcnow()
-        db.commit()
-    
-    return KeyBundleResponse(
+    # KeyService claims the prekey with a single UPDATE ... RETURNING whose
+    # subselect uses FOR UPDATE SKIP LOCKED (PostgreSQL), so two concurrent
+    # requests never consume the same prekey.
+    bundle = KeyBundleResponse(
         user_id=user.id,
         username=user.username,
         identity_key=user.identity_key,
         signed_prekey=user.signed_prekey,
-        signed_prekey_signature=user.signed_prekey_signature,
-        one_time_prekey=otpk_value
+        signed_prekey_signature=user.signed_prekey_signature
     )
+    claimed = KeyService(db).claim_one_time_prekey(user.id)
+    if claimed:
+        bundle.one_time_prekey = claimed.public_key
+    
+    return bundle
 
 
 @router.get("/{username}", response_model=PublicKeyResponse)
@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List
 from app.db.database import get_db, User
 from app.services.message_service import MessageService
 from app.api.routes.auth import oauth2_scheme
 from app.core.security import decode_access_token
-from app.models.message import MessageCreate, MessageResponse, CallLogResponse
+from app.models.message import MessageCreate, MessageResponse, CallLogResponse, ConversationsAdapter
 from app.api.websocket import manager
 from app.db.friend_repo import FriendRepository
 
@@ -36,6 +36,10 @@ async def send_message(
             detail="You must be friends with this user to send messages. Send a friend request first."
         )
     
+    # Stored as JSON and echoed over the WebSocket exactly as the client sent them
+    file_metadata = message.file_metadata.model_dump(exclude_unset=True) if message.file_metadata else None
+    sender_theme = message.sender_theme.model_dump(exclude_unset=True) if message.sender_theme else None
+    
     message_service = MessageService(db)
     
     new_message = message_service.send_message(
@@ -45,8 +49,8 @@ async def send_message(
         encrypted_key=message.encrypted_key,
         expiry_type=message.expiry_type,
         message_type=message.message_type,
-        file_metadata=message.file_metadata,
-        sender_theme=message.sender_theme
+        file_metadata=file_metadata,
+        sender_theme=sender_theme
     )
     
     # Attempt real-time delivery over WebSocket
@@ -64,7 +68,7 @@ async def send_message(
             "encrypted_key": new_message.encrypted_key,
             "message_type": new_message.message_type,
             "expiry_type": new_message.expiry_type,
-            "sender_theme": message.sender_theme,  # Include sender's theme for theme sync
+            "sender_theme": sender_theme,  # Include sender's theme for theme sync
             "timestamp": new_message.created_at.isoformat() if getattr(new_message, "created_at", None) else None,
         }
 
@@ -123,7 +127,7 @@ def get_message_history(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     return messages
 
-@router.get("/all-conversations", response_model=dict)
+@router.get("/all-conversations", response_model=Dict[str, List[MessageResponse]])
 def get_all_conversations_with_messages(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
@@ -142,12 +146,10 @@ def get_all_conversations_with_messages(
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
-    # Serialize to Pydantic models so FastAPI can return JSON safely
-    serialized = {
-        username: [MessageResponse.from_orm(msg) for msg in msgs]
-        for username, msgs in conversations.items()
-    }
-    return serialized
+    # Validate the ORM rows and encode straight to JSON bytes in one pass,
+    # skipping per-message model construction and jsonable_encoder
+    serialized = ConversationsAdapter.validate_python(conversations, from_attributes=True)
+    return Response(content=ConversationsAdapter.dump_json(serialized), media_type="application/json")
 
 @router.get("/unread", response_model=List[MessageResponse])
 def get_unread_messages(
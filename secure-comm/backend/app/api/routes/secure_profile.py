@@ -431,14 +431,9 @@ async def upload_encrypted_photo(
     if not abs_path.startswith(os.path.abspath(upload_dir)):
         raise HTTPException(status_code=400, detail="Invalid path")
     
-    # Write encrypted data to file
-    import base64
-    try:
-        encrypted_bytes = base64.b64decode(payload.encrypted_file)
-        with open(file_path, "wb") as f:
-            f.write(encrypted_bytes)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid encrypted file data: {e}")
+    # Write encrypted data to file (already base64-decoded by the model)
+    with open(file_path, "wb") as f:
+        f.write(payload.encrypted_file)
     
     pic = repo.store_encrypted_picture(
         user_id=user_id,
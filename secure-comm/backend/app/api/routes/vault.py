@@ -5,6 +5,7 @@ All content encrypted client-side - server stores only ciphertext
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timezone
@@ -27,6 +28,8 @@ from app.models.vault import (
 
 router = APIRouter()
 
+SYNC_CHUNK_SIZE = 500
+
 
 def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
     """Extract user ID from token"""
@@ -238,16 +241,22 @@ async def sync_vault(
         last_sync_time = decode_sync_token(sync_request.last_sync_token, expected_user_id=user_id)
     
     # Get updated items
-    query = db.query(VaultItem).filter(VaultItem.user_id == user_id)
+    stmt = select(VaultItem).where(VaultItem.user_id == user_id)
     
     if last_sync_time:
-        query = query.filter(VaultItem.updated_at > last_sync_time)
-    
-    items = query.all()
+        stmt = stmt.where(VaultItem.updated_at > last_sync_time)
     
-    # Separate updated and deleted
-    updated_items = [i for i in items if not i.is_deleted]
-    deleted_ids = [i.id for i in items if i.is_deleted]
+    # Stream in chunks and convert each chunk to response models as it
+    # arrives, so a full resync never holds every ORM row at once
+    updated_items = []
+    deleted_ids = []
+    result = db.execute(stmt.execution_options(yield_per=SYNC_CHUNK_SIZE)).scalars()
+    for chunk in result.partitions():
+        for item in chunk:
+            if item.is_deleted:
+                deleted_ids.append(item.id)
+            else:
+                updated_items.append(VaultItemResponse.model_validate(item))
     
     # Generate new sync token
     new_sync_token = generate_sync_token(user_id, datetime.now(timezone.utc))
@@ -1,8 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Date, Text, ForeignKey, Enum, Index, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Date, Text, ForeignKey, Enum, Index, JSON, text
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from sqlalchemy.ext.mutable import MutableDict, MutableList
 from datetime import datetime, timezone
 import enum
+import hashlib
 
 
 def _utcnow():
@@ -162,6 +163,13 @@ class User(Base):
     
     __table_args__ = (
         Index('ix_users_identity_key', 'identity_key'),
+        # Background jobs: 30-day account purge and prekey rotation check
+        Index(
+            'ix_users_deleted_at_partial', 'deleted_at',
+            postgresql_where=text('deleted_at IS NOT NULL'),
+            sqlite_where=text('deleted_at IS NOT NULL'),
+        ),
+        Index('ix_users_signed_prekey_timestamp', 'signed_prekey_timestamp'),
     )
 
 
@@ -196,6 +204,13 @@ class CallLog(Base):
     
     caller = relationship("User", foreign_keys=[caller_id], back_populates="initiated_calls")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_calls")
+    
+    __table_args__ = (
+        # get_call_history ORs the caller and receiver side, newest first;
+        # one index per side lets the planner merge two range scans
+        Index('ix_call_logs_caller_time', 'caller_id', 'start_time'),
+        Index('ix_call_logs_receiver_time', 'receiver_id', 'start_time'),
+    )
 
 
 class UserProfile(Base):
@@ -332,8 +347,13 @@ class Message(Base):
     __table_args__ = (
         Index('ix_messages_conversation', 'sender_id', 'recipient_id', 'created_at'),
         Index('ix_messages_recipient_status', 'recipient_id', 'status'),
-        # AUDIT FIX: Index for cleanup_expired_messages background task
-        Index('ix_messages_expires_at', 'expires_at'),
+        # Partial index for cleanup_expired_messages: only ephemeral rows are
+        # indexed, so the minutely DELETE scales with expired rows, not table size
+        Index(
+            'ix_messages_expires_at_partial', 'expires_at',
+            postgresql_where=text('expires_at IS NOT NULL'),
+            sqlite_where=text('expires_at IS NOT NULL'),
+        ),
     )
 
 
@@ -530,3 +550,40 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ============ Schema bootstrap ============
+
+def _schema_fingerprint() -> str:
+    """Hash of every registered table, its columns and its indexes."""
+    shape = sorted(
+        (t.name, str(list(t.columns.keys())), str(sorted(i.name or "" for i in t.indexes)))
+        for t in Base.metadata.tables.values()
+    )
+    return hashlib.sha256(repr(shape).encode()).hexdigest()
+
+
+def create_tables_if_changed(bind=None, force: bool = False) -> bool:
+    """Run ``Base.metadata.create_all`` only when the model schema changed.
+
+    ``create_all`` probes the catalog once per table on every boot. The hash
+    of the declared schema is stored in ``schema_version``; when it matches,
+    startup costs a single SELECT. Returns True if ``create_all`` ran.
+    """
+    bind = bind or engine
+    fingerprint = _schema_fingerprint()
+
+    with bind.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version (hash VARCHAR(64) NOT NULL)"
+        ))
+        stored = conn.execute(text("SELECT hash FROM schema_version LIMIT 1")).scalar()
+
+    if stored == fingerprint and not force:
+        return False
+
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        conn.execute(text("DELETE FROM schema_version"))
+        conn.execute(text("INSERT INTO schema_version (hash) VALUES (:hash)"), {"hash": fingerprint})
+    return True
@@ -21,6 +21,7 @@ from app.db.device_sync_models import (
     DeviceRevocationLog,
     RecoveryKeyBackup,
 )
+from app.models.device_sync import RewrappedKeyEntry
 
 
 class DeviceSyncRepository:
@@ -464,26 +465,26 @@ class DeviceSyncRepository:
         user_id: int,
         old_dek_version: int,
         new_dek_version: int,
-        rewrapped_keys: List[dict],
+        rewrapped_keys: List[RewrappedKeyEntry],
     ) -> int:
         """
         Batch update session keys re-wrapped with a new DEK.
 
-        Each entry in rewrapped_keys:
-          {"id": <sk_id>, "wrapped_session_key": "...", "session_key_nonce": "..."}
+        Each entry in rewrapped_keys is a validated RewrappedKeyEntry with
+        id, wrapped_session_key and session_key_nonce attributes.
         """
         count = 0
         for rk in rewrapped_keys:
             updated = (
                 self.db.query(EncryptedSessionKey)
                 .filter(
-                    EncryptedSessionKey.id == rk["id"],
+                    EncryptedSessionKey.id == rk.id,
                     EncryptedSessionKey.user_id == user_id,
                     EncryptedSessionKey.dek_version == old_dek_version,
                 )
                 .update({
-                    "wrapped_session_key": rk["wrapped_session_key"],
-                    "session_key_nonce": rk["session_key_nonce"],
+                    "wrapped_session_key": rk.wrapped_session_key,
+                    "session_key_nonce": rk.session_key_nonce,
                     "dek_version": new_dek_version,
                 })
             )
@@ -23,6 +23,7 @@ from app.db.friend_models import (
     NotificationTypeEnum,
     RejectionLog
 )
+from app.models.friend import compute_key_fingerprint, compute_key_fingerprints
 from app.db.database import User
 
 
@@ -722,13 +723,14 @@ class FriendRepository:
                 return []
         elif search_type == "fingerprint":
             # Search by public key fingerprint (exact match)
-            users = self.db.query(User).filter(
+            candidates = [u for u in self.db.query(User).filter(
                 User.is_active == True,
                 ~User.id.in_(exclude_ids)
-            ).all()
-            # Filter by fingerprint (computed from public key)
-            users = [u for u in users if u.public_key and 
-                    self._compute_fingerprint(u.public_key).upper().startswith(query.upper())][:limit]
+            ).all() if u.public_key]
+            # Filter by fingerprint (computed from public key, in one batch)
+            prefix = query.upper()
+            fingerprints = compute_key_fingerprints([u.public_key for u in candidates])
+            users = [u for u, fp in zip(candidates, fingerprints) if fp.startswith(prefix)][:limit]
         else:  # username search (default)
             # Only allow prefix matching to prevent scraping
             users = self.db.query(User).filter(
@@ -1043,17 +1045,7 @@ class FriendRepository:
         """Compute SHA-256 fingerprint of a public key"""
         if not public_key:
             return None
-        
-        # Clean the key
-        clean_key = public_key.replace("-----BEGIN PUBLIC KEY-----", "")
-        clean_key = clean_key.replace("-----END PUBLIC KEY-----", "")
-        clean_key = clean_key.replace("\n", "").replace("\r", "").replace(" ", "")
-        
-        # Compute hash
-        hash_bytes = hashlib.sha256(clean_key.encode()).digest()
-        
-        # Format as colon-separated hex (first 16 bytes = 128 bits)
-        return ":".join(f"{b:02X}" for b in hash_bytes[:16])
+        return compute_key_fingerprint(public_key)
     
     def _compute_identity_fingerprint(self, identity_key: Optional[str]) -> Optional[str]:
         """Compute fingerprint for identity key"""
@@ -3,8 +3,8 @@ CipherLink Message Repository
 Database operations for encrypted messages
 """
 
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, not_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import or_, and_, not_, case, func
 
 # ... rest of imports
 
@@ -19,6 +19,26 @@ class MessageRepository:
     def __init__(self, db: Session):
         self.db = db
     
+    def _query_with_usernames(self):
+        """Message query that also selects both participants' usernames."""
+        sender = aliased(User)
+        recipient = aliased(User)
+        return self.db.query(Message, sender.username, recipient.username).outerjoin(
+            sender, sender.id == Message.sender_id
+        ).outerjoin(
+            recipient, recipient.id == Message.recipient_id
+        )
+    
+    @staticmethod
+    def _attach_usernames(rows) -> List[Message]:
+        """Unpack _query_with_usernames rows into messages carrying the usernames."""
+        messages = []
+        for message, sender_username, recipient_username in rows:
+            message.sender_username = sender_username or "Unknown"
+            message.recipient_username = recipient_username or "Unknown"
+            messages.append(message)
+        return messages
+    
     def create(
         self, 
         sender_id: int, 
@@ -75,8 +95,8 @@ class MessageRepository:
         limit: int = 50,
         before_id: int = None
     ) -> List[Message]:
-        """Get messages between two users."""
-        query = self.db.query(Message).filter(
+        """Get messages between two users, with sender/recipient usernames attached."""
+        query = self._query_with_usernames().filter(
             or_(
                 and_(Message.sender_id == user1_id, Message.recipient_id == user2_id),
                 and_(Message.sender_id == user2_id, Message.recipient_id == user1_id)
@@ -90,19 +110,19 @@ class MessageRepository:
         if before_id:
             query = query.filter(Message.id < before_id)
         
-        messages = query.order_by(Message.created_at.desc()).limit(limit).all()
+        rows = query.order_by(Message.created_at.desc()).limit(limit).all()
         
         # Reverse to chronological order
-        return list(reversed(messages))
+        return self._attach_usernames(reversed(rows))
     
     def get_unread_by_recipient(self, recipient_id: int) -> List[Message]:
-        """Get all unread messages for a recipient."""
-        messages = self.db.query(Message).filter(
+        """Get all unread messages for a recipient, with usernames attached."""
+        rows = self._query_with_usernames().filter(
             Message.recipient_id == recipient_id,
             Message.status == MessageStatusEnum.SENT
         ).order_by(Message.created_at).all()
         
-        return messages
+        return self._attach_usernames(rows)
     
     def update_status(self, message_id: int, status: MessageStatusEnum) -> Optional[Message]:
         """Update message status."""
@@ -167,8 +187,8 @@ class MessageRepository:
         limit: int = 50,
         offset: int = 0
     ) -> List[Message]:
-        """Get paginated messages between two users."""
-        messages = self.db.query(Message).filter(
+        """Get paginated messages between two users, with usernames attached."""
+        rows = self._query_with_usernames().filter(
             or_(
                 and_(Message.sender_id == user1_id, Message.recipient_id == user2_id),
                 and_(Message.sender_id == user2_id, Message.recipient_id == user1_id)
@@ -180,7 +200,43 @@ class MessageRepository:
         ).order_by(Message.created_at.desc()).offset(offset).limit(limit).all()
         
         # Reverse to chronological order
-        return list(reversed(messages))
+        return self._attach_usernames(reversed(rows))
+    
+    def get_recent_per_peer(self, user_id: int, per_peer: int = 20) -> list:
+        """
+        Latest `per_peer` visible messages of every conversation, in one query.
+        Returns (message, sender_username, recipient_username) rows in
+        chronological order.
+        """
+        peer_id = case(
+            (Message.sender_id == user_id, Message.recipient_id),
+            else_=Message.sender_id,
+        )
+        ranked = self.db.query(
+            Message.id.label("id"),
+            func.row_number().over(
+                partition_by=peer_id,
+                order_by=(Message.created_at.desc(), Message.id.desc()),
+            ).label("rn"),
+        ).filter(
+            or_(Message.sender_id == user_id, Message.recipient_id == user_id),
+            Message.status != MessageStatusEnum.DELETED,
+            Message.status != MessageStatusEnum.EXPIRED,
+            not_(and_(Message.sender_id == user_id, Message.sender_deleted == True)),
+            not_(and_(Message.recipient_id == user_id, Message.recipient_deleted == True))
+        ).cte("ranked")
+        
+        sender = aliased(User)
+        recipient = aliased(User)
+        return self.db.query(Message, sender.username, recipient.username).join(
+            ranked, ranked.c.id == Message.id
+        ).join(
+            sender, sender.id == Message.sender_id
+        ).join(
+            recipient, recipient.id == Message.recipient_id
+        ).filter(
+            ranked.c.rn <= per_peer
+        ).order_by(Message.created_at, Message.id).all()
     
     def get_conversation_list(self, user_id: int) -> List[dict]:
         """Get list of conversations with last message preview."""
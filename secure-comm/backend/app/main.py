@@ -14,14 +14,24 @@ Features:
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 from contextlib import asynccontextmanager
 import asyncio
+import heapq
 import os
 import logging
-from datetime import datetime, timezone
-
-from app.core.security import get_current_user_id
+import mimetypes
+import random
+import stat
+import traceback
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from sqlalchemy import delete, func, or_, select, text, update
+
+from app.core.security import get_current_user_id, get_password_hash
 from app.api.routes import auth, keys, messages
 from app.api.routes.vault import router as vault_router
 from app.api.routes.contacts import router as contacts_router
@@ -31,8 +41,13 @@ from app.api.routes.verification import router as verification_router
 from app.api.routes.secure_profile import router as secure_profile_router
 from app.api.routes.device_sync import router as device_sync_router
 from app.api.websocket import router as websocket_router
-from app.core.config import settings
-from app.db.database import engine, Base
+from app.core.config import settings, parse_env_list
+from app.db.database import (
+    engine, create_tables_if_changed, SessionLocal,
+    User, Device, OneTimePreKey, Message, VaultItem, Contact, CallLog,
+    QRLoginSession, RefreshToken, ProfileHistory,
+)
+from app.db.user_repo import UserRepository
 # Import friend models to ensure they're registered with SQLAlchemy
 from app.db.friend_models import FriendRequest, TrustedContact, BlockedUser, FriendRequestRateLimit
 # Import secure profile models to ensure they're registered with SQLAlchemy
@@ -54,180 +69,240 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Background task for ephemeral message cleanup
-async def cleanup_expired_messages():
-    """Periodically delete expired ephemeral messages.
-    
-    AUDIT FIX: Uses try/finally to prevent session leaks on error.
-    AUDIT FIX: Wrapped sync DB work in asyncio.to_thread to avoid blocking event loop.
-    """
-    from app.db.database import SessionLocal, Message
-    
-    def _do_cleanup():
-        db = None
-        try:
-            db = SessionLocal()
-            expired = db.query(Message).filter(
-                Message.expires_at != None,
-                Message.expires_at < datetime.now(timezone.utc)
-            ).delete()
-            
-            if expired > 0:
-                logger.info(f"🧹 Cleaned up {expired} expired messages")
-            
-            db.commit()
-            return expired
-        except Exception as e:
-            logger.error(f"❌ Error in message cleanup: {e}")
-            if db:
-                try:
-                    db.rollback()
-                except Exception:
-                    pass
-        finally:
-            if db:
-                db.close()
-    
-    while True:
-        await asyncio.to_thread(_do_cleanup)
-        await asyncio.sleep(60)
+_UTC = timezone.utc
+
+
+class DestructiveMigrationRequired(RuntimeError):
+    """Raised at startup when a table can only be fixed by dropping it."""
 
-# Background task for key rotation
-async def rotate_signed_prekeys():
-    """Rotate signed prekeys weekly for enhanced security.
+    def __init__(self, table: str):
+        super().__init__(
+            f"Table '{table}' needs a destructive migration; "
+            "set ALLOW_DESTRUCTIVE_MIGRATION=1 to allow it"
+        )
+        self.table = table
+
+
+# Background job for ephemeral message cleanup
+def cleanup_expired_messages():
+    """Delete expired ephemeral messages.
     
     AUDIT FIX: Uses try/finally to prevent session leaks on error.
-    AUDIT FIX: Wrapped sync DB work in asyncio.to_thread to avoid blocking event loop.
+    Runs in a worker thread (see run_maintenance) to avoid blocking the event loop.
     """
-    from app.db.database import SessionLocal, User
-    from datetime import timedelta
-    
-    def _do_rotation_check():
-        db = None
-        try:
-            db = SessionLocal()
-            week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-            users_needing_rotation = db.query(User).filter(
-                User.signed_prekey_timestamp < week_ago
-            ).all()
-            
-            if users_needing_rotation:
-                logger.info(f"🔄 {len(users_needing_rotation)} users need key rotation")
-        except Exception as e:
-            logger.error(f"❌ Error in key rotation check: {e}")
-        finally:
-            if db:
-                db.close()
+    # Single bulk DELETE; func.now() is evaluated server-side
+    # (NOW() / CURRENT_TIMESTAMP), so no per-tick Python timestamp is bound
+    stmt = delete(Message).where(
+        Message.expires_at.is_not(None),
+        Message.expires_at < func.now()
+    ).execution_options(synchronize_session=False)
     
-    while True:
-        await asyncio.to_thread(_do_rotation_check)
-        await asyncio.sleep(86400)
+    db = None
+    try:
+        db = SessionLocal()
+        expired = db.execute(stmt).rowcount
+        
+        # Routine small passes only log at DEBUG so a high expiry rate
+        # doesn't turn log I/O into the bottleneck of this loop
+        if expired:
+            level = logging.INFO if expired > 100 else logging.DEBUG
+            if logger.isEnabledFor(level):
+                logger.log(level, "🧹 Cleaned up %d expired messages", expired, extra={"count": expired})
+        
+        db.commit()
+        return expired
+    except Exception as e:
+        logger.error(f"❌ Error in message cleanup: {e}")
+        if db:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+    finally:
+        if db:
+            db.close()
 
-# Background task for account cleanup
-async def cleanup_deleted_accounts():
-    """Permanently delete accounts marked for deletion over 30 days ago.
+# Background job for key rotation
+def rotate_signed_prekeys():
+    """Report users whose signed prekey is due for weekly rotation.
     
-    AUDIT FIX: Wrapped sync DB work in asyncio.to_thread to avoid blocking event loop.
+    AUDIT FIX: Uses try/finally to prevent session leaks on error.
     """
-    from app.db.database import SessionLocal, User
-    from datetime import timedelta
-    
-    def _do_account_cleanup():
-        db = None
-        try:
-            db = SessionLocal()
-            cutoff = datetime.now(timezone.utc) - timedelta(days=30)
-            
-            to_delete = db.query(User).filter(
-                User.deleted_at != None,
-                User.deleted_at < cutoff
-            ).all()
-            
-            if to_delete:
-                count = len(to_delete)
-                for user in to_delete:
-                    db.delete(user)
-                
-                db.commit()
-                logger.info(f"🗑️ Permanently deleted {count} accounts (30-day grace period expired)")
-        except Exception as e:
-            logger.error(f"❌ Error in account cleanup: {e}")
-        finally:
-            if db is not None:
-                db.close()
-    
-    while True:
-        await asyncio.to_thread(_do_account_cleanup)
-        await asyncio.sleep(86400)
+    db = None
+    try:
+        db = SessionLocal()
+        if settings.is_postgres:
+            week_ago = text("NOW() - INTERVAL '7 days'")
+        else:
+            week_ago = datetime.now(_UTC) - timedelta(days=7)
+        # Only the count is reported, so let the DB count instead of
+        # hydrating every matching User row
+        needing_rotation = db.execute(
+            select(func.count(User.id)).where(User.signed_prekey_timestamp < week_ago)
+        ).scalar()
+        
+        if needing_rotation:
+            logger.info(f"🔄 {needing_rotation} users need key rotation")
+    except Exception as e:
+        logger.error(f"❌ Error in key rotation check: {e}")
+    finally:
+        if db:
+            db.close()
 
+# Background job for account cleanup
+ACCOUNT_PURGE_BATCH_SIZE = 500
 
-# BUGFIX: Background task to clean up expired/revoked refresh tokens
-async def cleanup_expired_tokens():
-    """Periodically remove expired and revoked refresh tokens to prevent table bloat."""
-    from app.db.database import SessionLocal, RefreshToken
-    
-    def _do_token_cleanup():
-        db = None
-        try:
-            db = SessionLocal()
-            now = datetime.now(timezone.utc)
-            deleted = db.query(RefreshToken).filter(
-                (RefreshToken.expires_at < now) | (RefreshToken.is_revoked == True)
-            ).delete(synchronize_session=False)
+def _purge_account_batch(db, ids):
+    """Bulk-delete the given users and the rows that reference them."""
+    # These tables reference users.id without ON DELETE CASCADE (the
+    # cascade, where any, is ORM-only), so clear them before the bulk delete
+    user_messages = select(Message.id).where(
+        or_(Message.sender_id.in_(ids), Message.recipient_id.in_(ids))
+    )
+    db.execute(
+        update(Message)
+        .where(Message.reply_to_id.in_(user_messages))
+        .values(reply_to_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    for stmt in (
+        delete(Message).where(or_(Message.sender_id.in_(ids), Message.recipient_id.in_(ids))),
+        delete(CallLog).where(or_(CallLog.caller_id.in_(ids), CallLog.receiver_id.in_(ids))),
+        delete(Contact).where(or_(Contact.user_id.in_(ids), Contact.contact_user_id.in_(ids))),
+        delete(Device).where(Device.user_id.in_(ids)),
+        delete(OneTimePreKey).where(OneTimePreKey.user_id.in_(ids)),
+        delete(VaultItem).where(VaultItem.user_id.in_(ids)),
+        delete(QRLoginSession).where(QRLoginSession.user_id.in_(ids)),
+        delete(RefreshToken).where(RefreshToken.user_id.in_(ids)),
+        delete(User).where(User.id.in_(ids)),
+    ):
+        db.execute(stmt.execution_options(synchronize_session=False))
+
+def cleanup_deleted_accounts():
+    """Permanently delete accounts marked for deletion over 30 days ago."""
+    db = None
+    try:
+        db = SessionLocal()
+        cutoff = datetime.now(_UTC) - timedelta(days=30)
+        batch = select(User.id).where(
+            User.deleted_at.is_not(None),
+            User.deleted_at < cutoff
+        ).limit(ACCOUNT_PURGE_BATCH_SIZE)
+        
+        # Purge in bounded batches, committing each one, so lock time and
+        # memory stay constant however large the backlog is. Only ids are
+        # fetched; no User objects are hydrated, so there is nothing for
+        # yield_per streaming or per-object session.delete() to save
+        count = 0
+        while True:
+            ids = db.scalars(batch).all()
+            if not ids:
+                break
+            _purge_account_batch(db, ids)
             db.commit()
-            if deleted:
-                logger.info(f"🧹 Cleaned up {deleted} expired/revoked refresh tokens")
-        except Exception as e:
-            logger.error(f"❌ Error in token cleanup: {e}")
-        finally:
-            if db is not None:
-                db.close()
-    
-    while True:
-        await asyncio.to_thread(_do_token_cleanup)
-        await asyncio.sleep(3600)  # Run every hour
+            count += len(ids)
+        
+        if count:
+            logger.info(f"🗑️ Permanently deleted {count} accounts (30-day grace period expired)")
+    except Exception as e:
+        logger.error(f"❌ Error in account cleanup: {e}")
+        if db is not None:
+            db.rollback()
+    finally:
+        if db is not None:
+            db.close()
+
+
+# BUGFIX: Background job to clean up expired/revoked refresh tokens
+def cleanup_expired_tokens():
+    """Remove expired and revoked refresh tokens to prevent table bloat."""
+    db = None
+    try:
+        db = SessionLocal()
+        now = datetime.now(_UTC)
+        deleted = db.query(RefreshToken).filter(
+            (RefreshToken.expires_at < now) | (RefreshToken.is_revoked == True)
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            logger.info(f"🧹 Cleaned up {deleted} expired/revoked refresh tokens")
+    except Exception as e:
+        logger.error(f"❌ Error in token cleanup: {e}")
+    finally:
+        if db is not None:
+            db.close()
 
 
-# BUGFIX: Background task to prune excess profile history records
-async def prune_profile_history():
+# BUGFIX: Background job to prune excess profile history records
+def prune_profile_history():
     """Keep only the last 50 profile history entries per user to prevent unbounded growth."""
-    from app.db.database import SessionLocal, ProfileHistory
-    from sqlalchemy import func
-    
-    def _do_history_prune():
-        db = None
-        try:
-            db = SessionLocal()
-            # Find users with more than 50 history entries
-            user_counts = db.query(
-                ProfileHistory.user_id,
-                func.count(ProfileHistory.id).label('cnt')
-            ).group_by(ProfileHistory.user_id).having(func.count(ProfileHistory.id) > 50).all()
-            
-            total_pruned = 0
-            for user_id, count in user_counts:
-                excess = count - 50
-                oldest = db.query(ProfileHistory.id).filter(
-                    ProfileHistory.user_id == user_id
-                ).order_by(ProfileHistory.created_at.asc()).limit(excess).subquery()
-                
-                deleted = db.query(ProfileHistory).filter(
-                    ProfileHistory.id.in_(oldest)
-                ).delete(synchronize_session=False)
-                total_pruned += deleted
+    db = None
+    try:
+        db = SessionLocal()
+        # Find users with more than 50 history entries
+        user_counts = db.query(
+            ProfileHistory.user_id,
+            func.count(ProfileHistory.id).label('cnt')
+        ).group_by(ProfileHistory.user_id).having(func.count(ProfileHistory.id) > 50).all()
+        
+        total_pruned = 0
+        for user_id, count in user_counts:
+            excess = count - 50
+            oldest = db.query(ProfileHistory.id).filter(
+                ProfileHistory.user_id == user_id
+            ).order_by(ProfileHistory.created_at.asc()).limit(excess).subquery()
             
-            if total_pruned:
-                db.commit()
-                logger.info(f"🧹 Pruned {total_pruned} old profile history entries")
-        except Exception as e:
-            logger.error(f"❌ Error in profile history prune: {e}")
-        finally:
-            if db is not None:
-                db.close()
+            deleted = db.query(ProfileHistory).filter(
+                ProfileHistory.id.in_(oldest)
+            ).delete(synchronize_session=False)
+            total_pruned += deleted
+        
+        if total_pruned:
+            db.commit()
+            logger.info(f"🧹 Pruned {total_pruned} old profile history entries")
+    except Exception as e:
+        logger.error(f"❌ Error in profile history prune: {e}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+# (interval seconds, start delay seconds, job). The daily jobs are staggered
+# so they don't hit the DB on the same tick.
+MAINTENANCE_JOBS = (
+    (60, 0, cleanup_expired_messages),
+    (3600, 0, cleanup_expired_tokens),
+    (86400, 0, rotate_signed_prekeys),
+    (86400, 1800, cleanup_deleted_accounts),
+    (86400, 3600, prune_profile_history),
+)
+
+
+async def run_maintenance(jobs=MAINTENANCE_JOBS):
+    """Run all housekeeping jobs from a single task.
     
+    Jobs sit in a heap keyed by when they are next due, and the task only
+    wakes when one is. Deadlines are kept on the loop's monotonic clock, so a
+    cadence does not drift by the job's own runtime; up to 5% random jitter
+    is added per run so jobs don't fall into lockstep. Jobs run one at a time
+    in a worker thread so the sync DB work never blocks the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    # (due, job index, jitter-free deadline); the index also breaks ties
+    heap = [(start + delay, i, start + delay) for i, (_, delay, _) in enumerate(jobs)]
+    heapq.heapify(heap)
     while True:
-        await asyncio.to_thread(_do_history_prune)
-        await asyncio.sleep(86400)  # Run daily
+        due, i, deadline = heap[0]
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        heapq.heappop(heap)
+        interval, _, job = jobs[i]
+        await asyncio.to_thread(job)
+        # Don't try to catch up on runs missed while a job overran
+        deadline = max(deadline + interval, loop.time())
+        heapq.heappush(heap, (deadline + random.uniform(0, interval * 0.05), i, deadline))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -238,18 +313,25 @@ async def lifespan(app: FastAPI):
     logger.info(f"🗄️  Database: {settings.DATABASE_URL.split('://')[0]}")
     
     # Run database migration for PostgreSQL
+    schema_dropped = False
     if settings.is_postgres:
         logger.info("🔄 Running database migration for PostgreSQL...")
         try:
-            from sqlalchemy import text, inspect
-            
             with engine.connect() as conn:
-                inspector = inspect(engine)
-                tables = inspector.get_table_names()
+                # One catalog round trip for both tables instead of the
+                # inspector's per-table information_schema queries. A table
+                # with no rows here does not exist yet.
+                tables = {}
+                for table_name, column_name in conn.execute(text(
+                    "SELECT table_name, column_name FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() "
+                    "AND table_name IN ('users', 'friend_requests')"
+                )):
+                    tables.setdefault(table_name, set()).add(column_name)
                 
                 # ---- Migrate users table: add missing columns ----
                 if 'users' in tables:
-                    user_columns = {col['name'] for col in inspector.get_columns('users')}
+                    user_columns = tables['users']
                     user_migrations = []
                     
                     missing_cols = {
@@ -274,41 +356,50 @@ async def lifespan(app: FastAPI):
                         conn.commit()
                         logger.info("✅ Users table migration completed!")
                     else:
-                        logger.info("✅ Users table schema up to date")
+                        logger.debug("✅ Users table schema up to date")
                 
                 # ---- Migrate friend_requests table ----
                 # Check if friend_requests table needs migration
                 if 'friend_requests' in tables:
-                    columns = {col['name']: col for col in inspector.get_columns('friend_requests')}
-                    logger.info(f"📋 Current friend_requests columns: {list(columns.keys())}")
+                    columns = tables['friend_requests']
+                    logger.debug("📋 Current friend_requests columns: %s", sorted(columns))
                     
                     # If table has old schema columns (from_user_id, to_user_id), drop and recreate
                     has_old_columns = 'from_user_id' in columns or 'to_user_id' in columns
                     
                     if has_old_columns:
-                        logger.info("⚠️ Found old schema columns (from_user_id/to_user_id) - dropping table...")
+                        # Dropping the table destroys data and dependent constraints,
+                        # so it only happens when explicitly requested.
+                        if os.getenv("ALLOW_DESTRUCTIVE_MIGRATION") != "1":
+                            logger.error(
+                                "❌ friend_requests has old schema columns (from_user_id/to_user_id). "
+                                "Run fix_production_db.py or `alembic upgrade head` to copy them into "
+                                "sender_id/receiver_id and drop them, or set ALLOW_DESTRUCTIVE_MIGRATION=1 "
+                                "to drop and recreate the table (deletes all friend requests)."
+                            )
+                            raise DestructiveMigrationRequired("friend_requests")
+                        logger.warning("⚠️ Found old schema columns (from_user_id/to_user_id) - dropping table...")
                         conn.execute(text("DROP TABLE IF EXISTS friend_requests CASCADE"))
                         conn.commit()
+                        schema_dropped = True
                         logger.info("✅ Dropped old friend_requests table - will be recreated with correct schema")
                 else:
                     logger.info("📝 friend_requests table will be created fresh")
-                    
+
+        except DestructiveMigrationRequired:
+            raise
         except Exception as e:
             logger.error(f"❌ Migration error: {e}")
-            import traceback
             traceback.print_exc()
     
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
-    logger.info("📊 Database tables created/verified")
+    # Create database tables (skipped when the schema fingerprint is unchanged)
+    if create_tables_if_changed(engine, force=schema_dropped):
+        logger.info("📊 Database tables created/verified")
+    else:
+        logger.info("📊 Database schema unchanged, skipping create_all")
     
     # Create demo user if CREATE_DEMO_USER is set (for testing only)
-    import os
     if os.getenv("CREATE_DEMO_USER", "").lower() in ("true", "1", "yes"):
-        from app.db.database import SessionLocal
-        from app.db.user_repo import UserRepository
-        from app.core.security import get_password_hash
-        
         db = SessionLocal()
         try:
             user_repo = UserRepository(db)
@@ -324,25 +415,28 @@ async def lifespan(app: FastAPI):
             db.close()
     
     # Start background tasks
-    cleanup_task = asyncio.create_task(cleanup_expired_messages())
-    rotation_task = asyncio.create_task(rotate_signed_prekeys())
-    account_cleanup_task = asyncio.create_task(cleanup_deleted_accounts())
-    token_cleanup_task = asyncio.create_task(cleanup_expired_tokens())
-    history_prune_task = asyncio.create_task(prune_profile_history())
+    maintenance_task = asyncio.create_task(run_maintenance())
     logger.info("⚙️  Background tasks started")
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down ZeroTrace API...")
-    cleanup_task.cancel()
-    rotation_task.cancel()
-    account_cleanup_task.cancel()
-    token_cleanup_task.cancel()
-    history_prune_task.cancel()
+    maintenance_task.cancel()
     logger.info("✅ Shutdown complete")
 
 
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, which encodes straight to bytes.
+
+    Used for handlers that return plain dicts. Routes with a response_model
+    keep FastAPI's default class so Pydantic serializes them directly.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
 app = FastAPI(
     title="ZeroTrace API",
     description="""
@@ -379,61 +473,63 @@ app = FastAPI(
 # Build the CORS origins list - ALWAYS include both production and development origins
 def get_cors_origins():
     """Get all CORS origins including defaults and configured ones"""
-    # Start with hardcoded production frontend URL (ensures it's always included)
+    # Hardcoded production frontend URL first (ensures it's always included),
+    # then the development origins
     origins = [
         "https://zero-trace-virid.vercel.app",
-    ]
-    
-    # Add development origins
-    dev_origins = [
         "http://localhost:3000",
         "http://localhost:5173",
         "http://127.0.0.1:3000",
         "http://127.0.0.1:5173",
     ]
-    origins.extend(dev_origins)
     
-    # Add configured origins from settings (if any)
+    # Add configured origins from settings (if any), then ALLOWED_ORIGINS
     if settings.CORS_ORIGINS:
-        from app.core.config import parse_env_list, clean_origin
-        configured = parse_env_list(settings.CORS_ORIGINS, [])
-        for origin in configured:
-            if origin not in origins:
-                origins.append(origin)
-    
-    # Also include any from ALLOWED_ORIGINS that aren't already in the list
-    for origin in settings.ALLOWED_ORIGINS:
-        if origin not in origins:
-            origins.append(origin)
+        origins.extend(parse_env_list(settings.CORS_ORIGINS, []))
+    origins.extend(settings.ALLOWED_ORIGINS)
     
-    return origins
+    # Deduplicate in one pass, keeping first-seen order
+    return list(dict.fromkeys(origins))
 
 _cors_origins = get_cors_origins()
+# O(1) membership checks; the list is kept for CORSMiddleware
+_CORS_ORIGINS_SET = frozenset(_cors_origins)
+_CORS_ALLOW_METHODS = ["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"]
 
-# Log CORS configuration for debugging
-logger.info(f"🔒 CORS Origins configured: {_cors_origins}")
+# Log CORS configuration (DEBUG only; this is noise on every boot)
+logger.debug("🔒 CORS Origins configured: %s", _cors_origins)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_cors_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
+    allow_methods=_CORS_ALLOW_METHODS,
     allow_headers=["*"],
     expose_headers=["*"],
     max_age=600,
 )
 
 # Debug configuration
-logger.info(f"📋 ENVIRONMENT: {settings.ENVIRONMENT}")
-logger.info(f"📋 ALLOWED_HOSTS: {settings.ALLOWED_HOSTS}")
-logger.info(f"📋 ALLOWED_ORIGINS: {settings.ALLOWED_ORIGINS}")
-logger.info(f"📋 CORS_ORIGINS env: {settings.CORS_ORIGINS}")
+logger.debug("📋 ENVIRONMENT: %s", settings.ENVIRONMENT)
+logger.debug("📋 ALLOWED_HOSTS: %s", settings.ALLOWED_HOSTS)
+logger.debug("📋 ALLOWED_ORIGINS: %s", settings.ALLOWED_ORIGINS)
+logger.debug("📋 CORS_ORIGINS env: %s", settings.CORS_ORIGINS)
+
+# Security middleware - a bare "*" allowlist accepts every host, so skip the
+# extra middleware frame instead of checking a wildcard on each request
+if settings.ALLOWED_HOSTS and "*" not in settings.ALLOWED_HOSTS:
+    app.add_middleware(
+        TrustedHostMiddleware,
+        allowed_hosts=settings.ALLOWED_HOSTS
+    )
 
-# Security middleware
-app.add_middleware(
-    TrustedHostMiddleware, 
-    allowed_hosts=settings.ALLOWED_HOSTS
-)
+
+# Static CORS headers attached to error responses for allowed origins
+_CORS_ERROR_HEADERS = {
+    "Access-Control-Allow-Credentials": "true",
+    "Access-Control-Allow-Methods": ", ".join(_CORS_ALLOW_METHODS),
+    "Access-Control-Allow-Headers": "*",
+}
 
 
 # Global exception handler to ensure CORS headers on errors
@@ -446,7 +542,7 @@ async def global_exception_handler(request: Request, exc: Exception):
     origin = request.headers.get("origin", "")
     
     # Create the response
-    response = JSONResponse(
+    response = ORJSONResponse(
         status_code=500,
         content={
             "detail": "Internal server error",
@@ -456,11 +552,9 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
     
     # Add CORS headers if origin is allowed
-    if origin in _cors_origins:
+    if origin in _CORS_ORIGINS_SET:
         response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "*"
+        response.headers.update(_CORS_ERROR_HEADERS)
     
     return response
 
@@ -480,35 +574,85 @@ app.include_router(websocket_router, prefix="/ws", tags=["WebSocket"])
 # Uploads directory (served via authenticated route below)
 _upload_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
 os.makedirs(_upload_dir, exist_ok=True)
+_upload_dir_abs = os.path.abspath(_upload_dir)
+
+
+@lru_cache(maxsize=512)
+def _guess_content_type(ext: str) -> str:
+    """Content type for a lower-cased file extension (cached per extension)."""
+    return mimetypes.guess_type(f"file{ext}")[0] or "application/octet-stream"
+
+
+_UPLOAD_CACHE_CONTROL = "public, max-age=86400"
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Whether the client's cached copy (If-None-Match / If-Modified-Since) is current."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, as required for If-None-Match
+        return any(
+            tag.strip().removeprefix("W/") == etag.removeprefix("W/") or tag.strip() == "*"
+            for tag in if_none_match.split(",")
+        )
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
 
 
 @app.get("/uploads/{path:path}", tags=["Uploads"])
 async def serve_upload(
     path: str,
+    request: Request,
     _user_id: int = Depends(get_current_user_id),  # BUGFIX: Require authentication
 ):
-    """Serve uploaded files with path-traversal protection. Requires authentication."""
+    """Serve uploaded files with path-traversal protection. Requires authentication.
+    
+    Answers conditional requests with 304 Not Modified so clients revalidating
+    a cached avatar don't download it again.
+    """
     # Resolve and validate the path stays within upload_dir
-    requested = os.path.abspath(os.path.join(_upload_dir, path))
-    if not requested.startswith(os.path.abspath(_upload_dir)):
+    requested = os.path.normpath(os.path.join(_upload_dir_abs, path))
+    if not requested.startswith(_upload_dir_abs + os.sep):
         raise HTTPException(status_code=400, detail="Invalid path")
-    if not os.path.isfile(requested):
+    try:
+        # stat() can block on slow or network-backed disks; keep it off the loop.
+        # FileResponse already streams the body through a worker thread.
+        st = await asyncio.to_thread(os.stat, requested)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
         raise HTTPException(status_code=404, detail="File not found")
-    import mimetypes
-    content_type = mimetypes.guess_type(requested)[0] or "application/octet-stream"
+    
+    # Cheap validator from size + mtime; no hashing of file contents
+    etag = f'W/"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    if _not_modified(request, etag, st.st_mtime):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Cache-Control": _UPLOAD_CACHE_CONTROL},
+        )
+    
+    content_type = _guess_content_type(os.path.splitext(requested)[1].lower())
     return FileResponse(
         requested,
         media_type=content_type,
+        stat_result=st,
         headers={
             "Content-Security-Policy": "default-src 'none'",
             "Content-Disposition": f'inline; filename="{os.path.basename(requested)}"',
             "X-Content-Type-Options": "nosniff",
-            "Cache-Control": "public, max-age=86400",
+            "Cache-Control": _UPLOAD_CACHE_CONTROL,
+            "ETag": etag,
+            "Last-Modified": formatdate(st.st_mtime, usegmt=True),
         },
     )
 
 
-@app.get("/", tags=["Status"])
+@app.get("/", tags=["Status"], response_class=ORJSONResponse)
 async def root():
     """API root - status check"""
     return {
@@ -519,25 +663,28 @@ async def root():
     }
 
 
-@app.get("/health", tags=["Status"])
+@app.get("/health", tags=["Status"], response_class=ORJSONResponse)
 async def health_check():
     """Health check endpoint.
     
     AUDIT FIX: Uses text() for SQLAlchemy 2.x compatibility.
     Uses try/finally to prevent session leaks.
+    The blocking DB ping runs in a worker thread so frequent probes never
+    stall the event loop.
     """
-    db = None
-    try:
-        from app.db.database import SessionLocal
-        from sqlalchemy import text
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
-    finally:
-        if db:
-            db.close()
+    def _ping():
+        db = None
+        try:
+            db = SessionLocal()
+            db.execute(text("SELECT 1"))
+            return "connected"
+        except Exception as e:
+            return f"error: {str(e)}"
+        finally:
+            if db:
+                db.close()
+    
+    db_status = await asyncio.to_thread(_ping)
     
     return {
         "status": "healthy" if db_status == "connected" else "unhealthy",
@@ -547,14 +694,14 @@ async def health_check():
     }
 
 
-@app.get("/api/debug/cors", tags=["Debug"])
+@app.get("/api/debug/cors", tags=["Debug"], response_class=ORJSONResponse)
 async def debug_cors(request: Request):
     """Debug CORS configuration"""
     origin = request.headers.get("origin", "No origin header")
     return {
         "message": "CORS is working!",
         "request_origin": origin,
-        "origin_in_allowed_list": origin in _cors_origins,
+        "origin_in_allowed_list": origin in _CORS_ORIGINS_SET,
         "allowed_origins": _cors_origins,
         "configured_allowed_origins": settings.ALLOWED_ORIGINS,
         "cors_origins_env": settings.CORS_ORIGINS,
@@ -563,7 +710,7 @@ async def debug_cors(request: Request):
     }
 
 
-@app.get("/api/security-info", tags=["Status"])
+@app.get("/api/security-info", tags=["Status"], response_class=ORJSONResponse)
 async def security_info():
     """Public security information"""
     return {
@@ -594,10 +741,27 @@ async def security_info():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.ENVIRONMENT == "development",
-        log_level="info"
-    )
\ No newline at end of file
+    
+    if settings.ENVIRONMENT == "development":
+        # Auto-reload is single-process; "auto" still picks uvloop/httptools
+        # when available and falls back on platforms without them (Windows)
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            log_level="info"
+        )
+    else:
+        # Require the C-accelerated event loop and HTTP parser explicitly so a
+        # missing wheel fails at boot instead of silently degrading to asyncio/h11.
+        # Stays single-worker: ConnectionManager keeps sockets and presence in
+        # process memory, and the lifespan runs migrations and maintenance.
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="uvloop",
+            http="httptools",
+            log_level="info"
+        )
@@ -0,0 +1,16 @@
+"""
+Shared Pydantic model configuration
+"""
+
+import sys
+from typing import Annotated
+
+from pydantic import AfterValidator, ConfigDict
+
+# Response models are built from ORM rows and only ever serialized;
+# one shared config keeps them consistent across the models package
+RESPONSE_CONFIG = ConfigDict(from_attributes=True, extra="ignore")
+
+# For str fields drawn from a small closed vocabulary: every parsed value
+# shares one interned object instead of a fresh copy per row or request
+InternedStr = Annotated[str, AfterValidator(sys.intern)]
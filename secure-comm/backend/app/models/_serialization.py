@@ -0,0 +1,20 @@
+"""
+Cached Pydantic TypeAdapters for hand-serialized responses
+"""
+
+from functools import lru_cache
+from typing import Any
+
+from pydantic import TypeAdapter
+
+MAX_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=MAX_CACHE_SIZE)
+def adapter_for(tp: Any) -> TypeAdapter:
+    """
+    Return the TypeAdapter for a model or typing form, building it once
+    Core schema construction is the expensive part; every later call for
+    the same type is a dict lookup
+    """
+    return TypeAdapter(tp)
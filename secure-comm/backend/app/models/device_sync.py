@@ -5,20 +5,41 @@ Request/response schemas for device pairing, per-device DEK wrapping,
 session key management, device authorization, and revocation.
 """
 
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List, Dict
+from pydantic import AliasChoices, BaseModel, Field, ConfigDict, StringConstraints
+from typing import Annotated, Optional, List
 from datetime import datetime
 
 
+# Canonical (padded, standard-alphabet) base64, matched by pydantic-core's
+# regex engine so malformed key material is rejected before any DB write.
+# The value stays a str: it is stored and returned exactly as received.
+B64Text = Annotated[
+    str,
+    StringConstraints(
+        pattern=r"^(?:[A-Za-z0-9+/]{4})*(?:[A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?$"
+    ),
+]
+
+
+class _DeviceSyncModel(BaseModel):
+    """Shared config: immutable, strict about unknown fields, ORM-readable."""
+    model_config = ConfigDict(
+        extra="forbid",
+        frozen=True,
+        str_strip_whitespace=True,
+        from_attributes=True,
+    )
+
+
 # ==================== Device Pairing ====================
 
-class PairInitRequest(BaseModel):
+class PairInitRequest(_DeviceSyncModel):
     """Existing device initiates pairing."""
     device_id: str = Field(..., description="Initiating device's ID")
     device_name: str = Field(default="Unknown", description="Friendly name")
 
 
-class PairInitResponse(BaseModel):
+class PairInitResponse(_DeviceSyncModel):
     """Returned to existing device — contains QR payload."""
     pairing_token: str
     challenge: str
@@ -26,16 +47,16 @@ class PairInitResponse(BaseModel):
     qr_payload: str = Field(..., description="JSON string for QR code encoding")
 
 
-class PairScanRequest(BaseModel):
+class PairScanRequest(_DeviceSyncModel):
     """New device scans the QR code and calls this."""
     pairing_token: str
     device_id: str
     device_name: str = "New Device"
     device_type: str = "web"
-    device_public_key: str = Field(..., description="New device's X25519 public key, base64")
+    device_public_key: B64Text = Field(..., description="New device's X25519 public key, base64")
 
 
-class PairScanResponse(BaseModel):
+class PairScanResponse(_DeviceSyncModel):
     """Returned to new device after scan."""
     status: str
     challenge: str
@@ -43,14 +64,14 @@ class PairScanResponse(BaseModel):
     message: str
 
 
-class PairApproveRequest(BaseModel):
+class PairApproveRequest(_DeviceSyncModel):
     """Existing device approves the pairing."""
     pairing_token: str
-    wrapped_dek_for_device: str = Field(..., description="DEK re-wrapped for new device's public key")
-    dek_wrap_nonce: str
+    wrapped_dek_for_device: B64Text = Field(..., description="DEK re-wrapped for new device's public key")
+    dek_wrap_nonce: B64Text
 
 
-class PairApproveResponse(BaseModel):
+class PairApproveResponse(_DeviceSyncModel):
     """Returned to existing device after approval."""
     status: str
     new_device_id: str
@@ -58,12 +79,12 @@ class PairApproveResponse(BaseModel):
     message: str
 
 
-class PairCompleteRequest(BaseModel):
+class PairCompleteRequest(_DeviceSyncModel):
     """New device confirms it received the DEK."""
     pairing_token: str
 
 
-class PairCompleteResponse(BaseModel):
+class PairCompleteResponse(_DeviceSyncModel):
     """Final pairing response with encrypted data for new device."""
     wrapped_dek: str
     dek_wrap_nonce: str
@@ -71,7 +92,7 @@ class PairCompleteResponse(BaseModel):
     message: str
 
 
-class PairStatusResponse(BaseModel):
+class PairStatusResponse(_DeviceSyncModel):
     """Check pairing session status."""
     status: str
     new_device_id: Optional[str] = None
@@ -83,7 +104,7 @@ class PairStatusResponse(BaseModel):
 
 # ==================== Device Authorization ====================
 
-class DeviceInfoResponse(BaseModel):
+class DeviceInfoResponse(_DeviceSyncModel):
     """Device information."""
     id: int
     device_id: str
@@ -97,16 +118,14 @@ class DeviceInfoResponse(BaseModel):
     last_ip: Optional[str]
     revoked_at: Optional[datetime] = None
 
-    model_config = ConfigDict(from_attributes=True)
 
-
-class DeviceListResponse(BaseModel):
+class DeviceListResponse(_DeviceSyncModel):
     """List of authorized devices."""
     devices: List[DeviceInfoResponse]
     total: int
 
 
-class DeviceRevokeRequest(BaseModel):
+class DeviceRevokeRequest(_DeviceSyncModel):
     """Revoke a device."""
     device_id: str = Field(..., description="Device to revoke")
     reason: str = Field(default="user_initiated", description="Revocation reason")
@@ -114,7 +133,7 @@ class DeviceRevokeRequest(BaseModel):
     revoking_device_id: str = Field(default="", description="Which device is revoking")
 
 
-class DeviceRevokeResponse(BaseModel):
+class DeviceRevokeResponse(_DeviceSyncModel):
     """Revocation result."""
     success: bool
     message: str
@@ -124,17 +143,17 @@ class DeviceRevokeResponse(BaseModel):
 
 # ==================== Session Keys ====================
 
-class SessionKeyStoreRequest(BaseModel):
+class SessionKeyStoreRequest(_DeviceSyncModel):
     """Store a wrapped session key."""
     conversation_id: str
-    wrapped_session_key: str
-    session_key_nonce: str
+    wrapped_session_key: B64Text
+    session_key_nonce: B64Text
     dek_version: int
     key_version: int = 1
     first_message_id: Optional[int] = None
 
 
-class SessionKeyResponse(BaseModel):
+class SessionKeyResponse(_DeviceSyncModel):
     """Session key data."""
     id: int
     conversation_id: str
@@ -148,27 +167,31 @@ class SessionKeyResponse(BaseModel):
     message_count: int
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
 
+class RewrappedKeyEntry(_DeviceSyncModel):
+    """One session key re-wrapped under the new DEK."""
+    # The web client sends this as session_key_id
+    id: int = Field(..., validation_alias=AliasChoices("id", "session_key_id"))
+    wrapped_session_key: B64Text
+    session_key_nonce: B64Text
 
-class SessionKeyBatchRewrapRequest(BaseModel):
+
+class SessionKeyBatchRewrapRequest(_DeviceSyncModel):
     """Batch re-wrap session keys with a new DEK."""
     old_dek_version: int
     new_dek_version: int
-    rewrapped_keys: List[Dict] = Field(
-        ...,
-        description='List of {"id": N, "wrapped_session_key": "...", "session_key_nonce": "..."}'
-    )
+    rewrapped_keys: List[RewrappedKeyEntry]
 
 
 # ==================== Key Restore ====================
 
-class KeyRestoreRequest(BaseModel):
+class KeyRestoreRequest(_DeviceSyncModel):
     """On login, request wrapped DEK for this device."""
     device_id: str
+    device_public_key: Optional[B64Text] = Field(default=None, description="Sent by the web client; not used for restore")
 
 
-class KeyRestoreResponse(BaseModel):
+class KeyRestoreResponse(_DeviceSyncModel):
     """Wrapped DEK + sync data for a device."""
     wrapped_dek: str
     wrap_nonce: str
@@ -180,7 +203,7 @@ class KeyRestoreResponse(BaseModel):
 
 # ==================== Device Wrapped DEK ====================
 
-class DeviceWrappedDEKResponse(BaseModel):
+class DeviceWrappedDEKResponse(_DeviceSyncModel):
     """Response for per-device wrapped DEK query."""
     id: int
     device_id: str
@@ -190,28 +213,26 @@ class DeviceWrappedDEKResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
-
 
-class StoreWrappedDEKRequest(BaseModel):
+class StoreWrappedDEKRequest(_DeviceSyncModel):
     """Request body for storing a per-device wrapped DEK (moved from query params for security)."""
     device_id: str = Field(..., description="Target device ID")
-    wrapped_dek: str = Field(..., description="DEK wrapped for this device (base64)")
-    wrap_nonce: str = Field(..., description="Nonce used for wrapping (base64)")
+    wrapped_dek: B64Text = Field(..., description="DEK wrapped for this device (base64)")
+    wrap_nonce: B64Text = Field(..., description="Nonce used for wrapping (base64)")
     dek_version: int = Field(..., description="DEK version being wrapped")
 
 
-class RegisterDeviceRequest(BaseModel):
+class RegisterDeviceRequest(_DeviceSyncModel):
     """Request body for registering a device (moved from query params for security)."""
     device_id: str = Field(..., description="Unique device identifier")
     device_name: str = Field(default="Web Browser", description="Human-readable device name")
     device_type: str = Field(default="web", description="Device type (web, mobile, desktop)")
-    device_public_key: str = Field(default="", description="Device's public key for DEK wrapping")
+    device_public_key: B64Text = Field(default="", description="Device's public key for DEK wrapping")
 
 
 # ==================== Revocation Log ====================
 
-class RevocationLogEntry(BaseModel):
+class RevocationLogEntry(_DeviceSyncModel):
     """Single revocation event."""
     id: int
     revoked_device_id: str
@@ -223,17 +244,15 @@ class RevocationLogEntry(BaseModel):
     new_dek_version: Optional[int]
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
-
 
 # ==================== Recovery Key Backup ====================
 
-class RecoveryBackupRequest(BaseModel):
+class RecoveryBackupRequest(_DeviceSyncModel):
     """Create a password-derived recovery backup for the DEK."""
-    encrypted_dek: str = Field(..., description="DEK encrypted with password-derived key (base64)")
-    encryption_nonce: str = Field(..., description="Nonce used for encryption (base64)")
+    encrypted_dek: B64Text = Field(..., description="DEK encrypted with password-derived key (base64)")
+    encryption_nonce: B64Text = Field(..., description="Nonce used for encryption (base64)")
     encryption_algorithm: str = Field(default="xsalsa20-poly1305")
-    kdf_salt: str = Field(..., description="Salt used for key derivation (base64)")
+    kdf_salt: B64Text = Field(..., description="Salt used for key derivation (base64)")
     kdf_algorithm: str = Field(default="pbkdf2-sha256", description="pbkdf2-sha256 or argon2id")
     kdf_iterations: int = Field(default=600000, description="PBKDF2 iterations")
     kdf_memory: Optional[int] = Field(default=None, description="Argon2 memory cost (KB)")
@@ -241,7 +260,7 @@ class RecoveryBackupRequest(BaseModel):
     dek_version: int = Field(..., description="Which DEK version this backup covers")
 
 
-class RecoveryBackupResponse(BaseModel):
+class RecoveryBackupResponse(_DeviceSyncModel):
     """Recovery backup stored confirmation."""
     id: int
     dek_version: int
@@ -249,10 +268,8 @@ class RecoveryBackupResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
-
 
-class RecoveryRestoreResponse(BaseModel):
+class RecoveryRestoreResponse(_DeviceSyncModel):
     """Data needed to restore DEK from recovery backup."""
     encrypted_dek: str
     encryption_nonce: str
@@ -264,5 +281,3 @@ class RecoveryRestoreResponse(BaseModel):
     kdf_parallelism: Optional[int] = None
     dek_version: int
     created_at: datetime
-
-    model_config = ConfigDict(from_attributes=True)
@@ -3,15 +3,23 @@ Friend Request & Secure Contact Models
 Zero-knowledge friend system with mutual consent and key exchange
 """
 
-from pydantic import BaseModel, Field, ConfigDict, field_validator
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
-from enum import Enum
+from enum import StrEnum, unique
 import hashlib
+import hmac
 import re
 
+from app.models._config import RESPONSE_CONFIG
 
-class FriendRequestStatus(str, Enum):
+# PEM armor and any whitespace, stripped in one pass (matches the web client)
+_PEM_STRIP_RE = re.compile(r'-----(?:BEGIN|END) PUBLIC KEY-----|\s')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+@unique
+class FriendRequestStatus(StrEnum):
     """Status of a friend request"""
     PENDING = "pending"
     ACCEPTED = "accepted"
@@ -20,14 +28,16 @@ class FriendRequestStatus(str, Enum):
     EXPIRED = "expired"
 
 
-class TrustLevel(str, Enum):
+@unique
+class TrustLevel(StrEnum):
     """Level of trust for a contact"""
     UNVERIFIED = "unverified"  # Keys exchanged but not manually verified
     VERIFIED = "verified"      # Keys manually verified (QR/fingerprint)
     TRUSTED = "trusted"        # Long-term trusted contact
 
 
-class BlockReason(str, Enum):
+@unique
+class BlockReason(StrEnum):
     """Reason for blocking a user"""
     SPAM = "spam"
     HARASSMENT = "harassment"
@@ -39,16 +49,9 @@ class BlockReason(str, Enum):
 
 class FriendRequestCreate(BaseModel):
     """Create a new friend request"""
-    receiver_username: str = Field(..., min_length=3, max_length=50)
+    receiver_username: str = Field(..., min_length=3, max_length=50, pattern="^[a-zA-Z0-9_]+$")
     sender_public_key_fingerprint: str = Field(..., description="SHA-256 fingerprint of sender's public key")
     message: Optional[str] = Field(None, max_length=200, description="Optional introduction message (encrypted)")
-    
-    @field_validator('receiver_username')
-    @classmethod
-    def validate_username(cls, v):
-        if not re.match(r'^[a-zA-Z0-9_]+$', v):
-            raise ValueError('Username must contain only alphanumeric characters and underscores')
-        return v
 
 
 class FriendRequestResponse(BaseModel):
@@ -66,7 +69,7 @@ class FriendRequestResponse(BaseModel):
     updated_at: Optional[datetime] = None
     expires_at: datetime
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class FriendRequestAccept(BaseModel):
@@ -97,7 +100,7 @@ class TrustedContactResponse(BaseModel):
     last_key_exchange: datetime
     created_at: datetime
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class ContactVerification(BaseModel):
@@ -126,7 +129,7 @@ class BlockedUserResponse(BaseModel):
     reason: BlockReason
     blocked_at: datetime
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class UserSearchRequest(BaseModel):
@@ -165,7 +168,8 @@ class PendingRequestsResponse(BaseModel):
 
 # ============ Notification Models ============
 
-class NotificationType(str, Enum):
+@unique
+class NotificationType(StrEnum):
     """Types of notifications"""
     FRIEND_REQUEST = "friend_request"
     FRIEND_REQUEST_ACCEPTED = "friend_request_accepted"
@@ -191,7 +195,7 @@ class NotificationResponse(BaseModel):
     is_delivered: bool
     created_at: datetime
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class NotificationCountResponse(BaseModel):
@@ -223,23 +227,41 @@ def compute_key_fingerprint(public_key: str) -> str:
     Returns fingerprint in format: XX:XX:XX:XX...
     """
     # Remove any whitespace and headers
-    clean_key = public_key.replace("-----BEGIN PUBLIC KEY-----", "")
-    clean_key = clean_key.replace("-----END PUBLIC KEY-----", "")
-    clean_key = clean_key.replace("\n", "").replace("\r", "").replace(" ", "")
+    clean_key = _PEM_STRIP_RE.sub("", public_key)
     
     # Compute SHA-256 hash
     hash_bytes = hashlib.sha256(clean_key.encode()).digest()
     
-    # Format as colon-separated hex pairs
-    fingerprint = ":".join(f"{b:02X}" for b in hash_bytes[:16])  # First 128 bits
-    return fingerprint
+    # Format as colon-separated hex pairs (first 128 bits)
+    return hash_bytes[:16].hex(":").upper()
+
+
+def compute_key_fingerprints(public_keys: List[str]) -> List[str]:
+    """
+    Compute fingerprints for many public keys in one call
+    Same format as compute_key_fingerprint, in input order
+    """
+    sha256 = hashlib.sha256
+    strip = _PEM_STRIP_RE.sub
+    return [
+        sha256(strip("", key).encode()).digest()[:16].hex(":").upper()
+        for key in public_keys
+    ]
+
+
+def _normalize_fingerprint(fingerprint: str) -> bytes:
+    return _WHITESPACE_RE.sub("", fingerprint).upper().encode()
 
 
 def verify_fingerprint_match(fingerprint1: str, fingerprint2: str) -> bool:
     """
-    Compare two fingerprints (case-insensitive)
+    Compare two fingerprints (case- and whitespace-insensitive)
+    Uses a constant-time comparison so the match doesn't leak via timing
     """
-    return fingerprint1.upper().replace(" ", "") == fingerprint2.upper().replace(" ", "")
+    return hmac.compare_digest(
+        _normalize_fingerprint(fingerprint1),
+        _normalize_fingerprint(fingerprint2),
+    )
 
 
 class RequestNonce(BaseModel):
@@ -1,10 +1,14 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict
 from datetime import datetime
-from enum import Enum
+from enum import StrEnum, unique
 
+from app.models._config import RESPONSE_CONFIG
+from app.models._serialization import adapter_for
 
-class MessageType(str, Enum):
+
+@unique
+class MessageType(StrEnum):
     TEXT = "text"
     IMAGE = "image"
     FILE = "file"
@@ -13,7 +17,8 @@ class MessageType(str, Enum):
     SYSTEM = "system"
 
 
-class ExpiryType(str, Enum):
+@unique
+class ExpiryType(StrEnum):
     NONE = "none"
     AFTER_READ = "after_read"
     TIMED_10S = "10s"
@@ -22,7 +27,8 @@ class ExpiryType(str, Enum):
     TIMED_24H = "24h"
 
 
-class MessageStatus(str, Enum):
+@unique
+class MessageStatus(StrEnum):
     SENT = "sent"
     DELIVERED = "delivered"
     READ = "read"
@@ -30,6 +36,29 @@ class MessageStatus(str, Enum):
     DELETED = "deleted"
 
 
+class FileMetadata(BaseModel):
+    """Attachment details sent alongside file/media messages"""
+    name: Optional[str] = None
+    type: Optional[str] = None
+    size: Optional[int] = None
+    
+    # Unknown keys are kept so newer clients can add fields without a server change
+    model_config = ConfigDict(extra="allow")
+
+
+class SenderTheme(BaseModel):
+    """Sender's chat theme, mirrored on the recipient's side (unencrypted UI metadata)"""
+    bubbleColor: Optional[str] = None
+    textColor: Optional[str] = None
+    style: Optional[str] = None
+    font: Optional[str] = None
+    accentGradient: Optional[str] = None
+    accentPrimary: Optional[str] = None
+    accentSecondary: Optional[str] = None
+    
+    model_config = ConfigDict(extra="allow")
+
+
 class MessageBase(BaseModel):
     encrypted_content: str = Field(..., description="Base64 encoded ciphertext")
     message_type: MessageType = MessageType.TEXT
@@ -41,11 +70,11 @@ class MessageCreate(MessageBase):
     # For hybrid encryption - encrypted session key
     encrypted_key: Optional[str] = Field(None, description="Encrypted AES key for hybrid encryption")
     # For file/media messages
-    file_metadata: Optional[dict] = Field(None, description="Encrypted file metadata")
+    file_metadata: Optional[FileMetadata] = Field(None, description="Encrypted file metadata")
     # Reply reference
     reply_to_id: Optional[int] = None
     # Sender's theme for theme synchronization (unencrypted UI metadata)
-    sender_theme: Optional[dict] = Field(None, description="Sender's theme preferences for theme sync")
+    sender_theme: Optional[SenderTheme] = Field(None, description="Sender's theme preferences for theme sync")
 
 
 class MessageResponse(BaseModel):
@@ -67,7 +96,11 @@ class MessageResponse(BaseModel):
     delivered_at: Optional[datetime] = None
     read_at: Optional[datetime] = None
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
+
+
+# Built once at import; validates ORM rows and dumps JSON in one pydantic-core pass
+ConversationsAdapter = adapter_for(Dict[str, List[MessageResponse]])
 
 
 class MessageUpdate(BaseModel):
@@ -139,4 +172,4 @@ class CallLogResponse(BaseModel):
     end_time: Optional[datetime] = None
     duration_seconds: int = 0
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
@@ -1,10 +1,13 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import date, datetime
-from enum import Enum
+from enum import StrEnum, unique
 
+from app.models._config import RESPONSE_CONFIG, InternedStr
 
-class VisibilityLevel(str, Enum):
+
+@unique
+class VisibilityLevel(StrEnum):
     EVERYONE = "everyone"
     FRIENDS = "friends"
     NOBODY = "nobody"
@@ -34,7 +37,7 @@ class ProfileResponse(ProfileUpdate):
     is_blocked: bool = False
     is_friend: bool = False
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class PrivacySettingsUpdate(BaseModel):
@@ -54,10 +57,11 @@ class PrivacySettingsResponse(PrivacySettingsUpdate):
     created_at: datetime
     updated_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
-class ReportReason(str, Enum):
+@unique
+class ReportReason(StrEnum):
     FAKE_PROFILE = "fake_profile"
     IMPERSONATION = "impersonation"
     HARASSMENT = "harassment"
@@ -76,10 +80,10 @@ class ProfileHistoryEntry(BaseModel):
     id: int
     changed_fields: list[str] = []
     snapshot: Dict[str, Any]
-    change_source: str
+    change_source: InternedStr
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class RollbackRequest(BaseModel):
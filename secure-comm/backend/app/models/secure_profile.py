@@ -10,15 +10,18 @@ All profile data is encrypted client-side with the DEK.
 On key rotation, only the DEK wrapping changes — profile blobs are NOT re-encrypted.
 """
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import Base64Bytes, BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from enum import Enum
+from enum import StrEnum, unique
+
+from app.models._config import RESPONSE_CONFIG, InternedStr
 
 
 # ============ Key Hierarchy Models ============
 
-class KeyType(str, Enum):
+@unique
+class KeyType(StrEnum):
     IDENTITY = "identity"
     DATA_ENCRYPTION = "data_encryption"
     SESSION = "session"
@@ -43,7 +46,7 @@ class DEKResponse(BaseModel):
     created_at: datetime
     rotated_at: Optional[datetime] = None
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class DEKRotateRequest(BaseModel):
@@ -95,12 +98,12 @@ class EncryptedProfileResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class EncryptedProfilePictureCreate(BaseModel):
     """Client submits encrypted profile picture"""
-    encrypted_file: str = Field(..., description="Encrypted file data, base64")
+    encrypted_file: Base64Bytes = Field(..., description="Encrypted file data, base64 (decoded to bytes on validation)")
     file_nonce: str = Field(..., description="Nonce for file encryption, base64")
     dek_version: int = Field(..., description="Which DEK version encrypted this file")
     content_hash: str = Field(..., description="SHA-256 hash of original file for integrity")
@@ -119,7 +122,7 @@ class EncryptedProfilePictureResponse(BaseModel):
     version: int
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 # ============ Message Metadata Models ============
@@ -129,7 +132,7 @@ class EncryptedMessageMetadataCreate(BaseModel):
     encrypted_blob: str = Field(..., description="Metadata encrypted with DEK, base64")
     blob_nonce: str = Field(..., description="Nonce for metadata encryption, base64")
     dek_version: int = Field(..., description="Which DEK version encrypted this blob")
-    metadata_type: str = Field(default="chat_settings", description="Type: chat_settings, contact_nicknames, pinned_chats, preferences")
+    metadata_type: InternedStr = Field(default="chat_settings", description="Type: chat_settings, contact_nicknames, pinned_chats, preferences")
 
 
 class EncryptedMessageMetadataResponse(BaseModel):
@@ -138,12 +141,12 @@ class EncryptedMessageMetadataResponse(BaseModel):
     encrypted_blob: str
     blob_nonce: str
     dek_version: int
-    metadata_type: str
+    metadata_type: InternedStr
     version: int
     created_at: datetime
     updated_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 # ============ Backup & Recovery Models ============
@@ -165,7 +168,7 @@ class BackupResponse(BaseModel):
     profile_version: int
     file_size: int
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class BackupRestoreRequest(BaseModel):
@@ -1,10 +1,31 @@
-from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional, List
+from pydantic import BaseModel, BeforeValidator, EmailStr, Field, model_validator
+from typing import Annotated, Optional, List
 from datetime import datetime
-from enum import Enum
+from enum import StrEnum, unique
+import re
 
+from app.models._config import RESPONSE_CONFIG
 
-class DeviceType(str, Enum):
+# Cheap shape check run before email-validator, whose parser degrades badly
+# on long adversarial inputs (e.g. "<" followed by thousands of spaces)
+_EMAIL_PREFILTER_RE = re.compile(r'[^<>\s@]{1,64}@[^<>\s@]{1,253}')
+
+
+def _prefilter_email(value):
+    if isinstance(value, str) and (len(value) > 254 or not _EMAIL_PREFILTER_RE.fullmatch(value)):
+        raise ValueError("value is not a valid email address")
+    return value
+
+
+Email = Annotated[EmailStr, BeforeValidator(_prefilter_email)]
+
+# Base64 length of a 32-byte X25519 public key
+PREKEY_B64_LEN = 44
+MAX_PREKEY_UPLOAD = 100
+
+
+@unique
+class DeviceType(StrEnum):
     WEB = "web"
     MOBILE = "mobile"
     DESKTOP = "desktop"
@@ -12,7 +33,7 @@ class DeviceType(str, Enum):
 
 class UserBase(BaseModel):
     username: str = Field(..., min_length=3, max_length=50, pattern="^[a-zA-Z0-9_]+$")
-    email: EmailStr
+    email: Email
 
 
 class UserCreate(UserBase):
@@ -33,7 +54,7 @@ class UserResponse(UserBase):
     display_name: Optional[str] = None
     avatar_url: Optional[str] = None
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class UserProfile(BaseModel):
@@ -69,7 +90,7 @@ class DeviceResponse(BaseModel):
     last_active: datetime
     is_current: bool = False
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class KeyBundle(BaseModel):
@@ -86,18 +107,51 @@ class KeyBundleRequest(BaseModel):
     username: str
 
 
+def _expand_prekey_blob(model):
+    """Split one_time_prekeys_blob into one_time_prekeys (fixed-width keys)"""
+    blob = model.one_time_prekeys_blob
+    if blob is None:
+        return model
+    if model.one_time_prekeys:
+        raise ValueError("Send one_time_prekeys or one_time_prekeys_blob, not both")
+    count = model.one_time_prekeys_count
+    if count is None:
+        raise ValueError("one_time_prekeys_count is required with one_time_prekeys_blob")
+    if len(blob) != count * PREKEY_B64_LEN:
+        raise ValueError(f"one_time_prekeys_blob must be {PREKEY_B64_LEN} characters per key")
+    model.one_time_prekeys = [blob[i:i + PREKEY_B64_LEN] for i in range(0, len(blob), PREKEY_B64_LEN)]
+    return model
+
+
 class PublicKeyUpload(BaseModel):
     """Upload cryptographic keys"""
     public_key: str = Field(..., description="RSA/ECC public key for encryption")
     identity_key: str = Field(..., description="Long-term identity key")
     signed_prekey: str = Field(..., description="Signed pre-key")
     signed_prekey_signature: str = Field(..., description="Pre-key signature")
-    one_time_prekeys: List[str] = Field(default=[], min_length=0, max_length=100)
+    one_time_prekeys: List[str] = Field(default=[], min_length=0, max_length=MAX_PREKEY_UPLOAD)
+    # Compact alternative to the list: keys concatenated, validated as one string
+    one_time_prekeys_blob: Optional[str] = Field(None, max_length=MAX_PREKEY_UPLOAD * PREKEY_B64_LEN)
+    one_time_prekeys_count: Optional[int] = Field(None, ge=0, le=MAX_PREKEY_UPLOAD)
+    
+    @model_validator(mode="after")
+    def expand_prekey_blob(self):
+        return _expand_prekey_blob(self)
 
 
 class PreKeyRefill(BaseModel):
     """Refill one-time pre-keys when running low"""
-    one_time_prekeys: List[str] = Field(..., min_length=1, max_length=100)
+    one_time_prekeys: List[str] = Field(default=[], max_length=MAX_PREKEY_UPLOAD)
+    # Compact alternative to the list: keys concatenated, validated as one string
+    one_time_prekeys_blob: Optional[str] = Field(None, max_length=MAX_PREKEY_UPLOAD * PREKEY_B64_LEN)
+    one_time_prekeys_count: Optional[int] = Field(None, ge=1, le=MAX_PREKEY_UPLOAD)
+    
+    @model_validator(mode="after")
+    def expand_prekey_blob(self):
+        _expand_prekey_blob(self)
+        if not self.one_time_prekeys:
+            raise ValueError("At least one one-time pre-key is required")
+        return self
 
 
 # ============ Authentication ============
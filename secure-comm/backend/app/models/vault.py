@@ -4,13 +4,18 @@ Encrypted personal storage for notes, passwords, and documents
 All content encrypted client-side - server stores only ciphertext
 """
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
-from enum import Enum
+from enum import StrEnum, unique
 
+from app.models._config import RESPONSE_CONFIG
 
-class VaultItemType(str, Enum):
+SHA256_HEX_PATTERN = r"^[0-9a-fA-F]{64}$"
+
+
+@unique
+class VaultItemType(StrEnum):
     NOTE = "note"
     PASSWORD = "password"
     DOCUMENT = "document"
@@ -51,7 +56,7 @@ class VaultItemResponse(VaultItemBase):
     version: int = 1  # For sync conflict resolution
     is_deleted: bool = False  # Soft delete for sync
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 class VaultItemList(BaseModel):
@@ -59,6 +64,8 @@ class VaultItemList(BaseModel):
     items: List[VaultItemResponse]
     sync_token: str  # For incremental sync
     has_more: bool = False
+    
+    model_config = RESPONSE_CONFIG
 
 
 class VaultSyncRequest(BaseModel):
@@ -73,6 +80,8 @@ class VaultSyncResponse(BaseModel):
     deleted_item_ids: List[int]
     new_sync_token: str
     server_time: datetime
+    
+    model_config = RESPONSE_CONFIG
 
 
 # ============ Password Generator Settings ============
@@ -113,14 +122,16 @@ class SharedVaultItemResponse(BaseModel):
     shared_at: datetime
     expires_at: Optional[datetime] = None
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 
 # ============ Vault Backup ============
 
 class VaultBackupRequest(BaseModel):
     """Request encrypted backup of all vault items"""
-    backup_password_hash: str  # Hash of additional backup password
+    # SHA-256 hex of the additional backup password; fixed length so the
+    # server-side comparison (secure_eq) always sees equal-length inputs
+    backup_password_hash: str = Field(..., pattern=SHA256_HEX_PATTERN)
 
 
 class VaultBackupResponse(BaseModel):
@@ -134,4 +145,4 @@ class VaultBackupResponse(BaseModel):
 class VaultRestoreRequest(BaseModel):
     """Restore vault from backup"""
     backup_id: str
-    backup_password_hash: str
+    backup_password_hash: str = Field(..., pattern=SHA256_HEX_PATTERN)
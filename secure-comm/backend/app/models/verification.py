@@ -1,16 +1,20 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 from datetime import datetime
-from enum import Enum
+from enum import StrEnum, unique
 
-class VerificationType(str, Enum):
+from app.models._config import RESPONSE_CONFIG
+
+@unique
+class VerificationType(StrEnum):
     IDENTITY = "identity"
     EMAIL = "email"
     PHONE = "phone"
     ORGANIZATION = "organization"
     CUSTOM = "custom"
 
-class VerificationStatus(str, Enum):
+@unique
+class VerificationStatus(StrEnum):
     PENDING = "pending"
     APPROVED = "approved"
     REJECTED = "rejected"
@@ -27,7 +31,7 @@ class VerificationBadgeResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 class VerificationRequestCreate(BaseModel):
     verification_type: VerificationType
@@ -46,7 +50,7 @@ class VerificationRequestResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 class VerificationRequestReview(BaseModel):
     request_id: int
@@ -65,7 +69,7 @@ class VerificationHistoryResponse(BaseModel):
     meta: Optional[Dict[str, Any]] = None
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
 
 class UserVerificationSummary(BaseModel):
     user_id: int
@@ -73,4 +77,4 @@ class UserVerificationSummary(BaseModel):
     verification_level: int
     badges: List[VerificationBadgeResponse]
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = RESPONSE_CONFIG
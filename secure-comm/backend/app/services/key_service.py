@@ -3,6 +3,8 @@ CipherLink Key Service
 Handles cryptographic key operations for E2E encryption
 """
 
+from datetime import datetime, timezone
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.orm import Session
 from app.db.user_repo import UserRepository
 from app.db.database import User, OneTimePreKey
@@ -52,7 +54,6 @@ class KeyService:
         user.signed_prekey = signed_prekey
         user.signed_prekey_signature = signed_prekey_signature
         
-        from datetime import datetime, timezone
         user.signed_prekey_timestamp = datetime.now(timezone.utc)
         
         self.db.commit()
@@ -67,12 +68,6 @@ class KeyService:
         if not user.identity_key or not user.signed_prekey:
             return None
         
-        # Get one available one-time prekey
-        one_time_prekey = self.db.query(OneTimePreKey).filter(
-            OneTimePreKey.user_id == user.id,
-            OneTimePreKey.is_used == False
-        ).first()
-        
         bundle = {
             "user_id": user.id,
             "username": user.username,
@@ -82,6 +77,8 @@ class KeyService:
             "one_time_prekey": None
         }
         
+        # Claim (not just peek at) a one-time prekey so no two initiators share one
+        one_time_prekey = self.claim_one_time_prekey(user.id)
         if one_time_prekey:
             bundle["one_time_prekey"] = one_time_prekey.public_key
             bundle["one_time_prekey_id"] = one_time_prekey.key_id
@@ -90,28 +87,41 @@ class KeyService:
     
     def consume_one_time_prekey(self, user_id: int, key_id: int) -> Optional[str]:
         """Mark a one-time prekey as used and return it."""
-        prekey = self.db.query(OneTimePreKey).filter(
+        claimed = self.claim_one_time_prekey(user_id, key_id)
+        return claimed.public_key if claimed else None
+    
+    def claim_one_time_prekey(self, user_id: int, key_id: Optional[int] = None):
+        """
+        Atomically mark one unused prekey as used and return its (key_id, public_key).
+        A single UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING,
+        so concurrent callers can never claim the same key. Returns None when
+        no unused key matches.
+        """
+        candidate = select(OneTimePreKey.id).where(
             OneTimePreKey.user_id == user_id,
-            OneTimePreKey.key_id == key_id,
             OneTimePreKey.is_used == False
+        )
+        if key_id is not None:
+            candidate = candidate.where(OneTimePreKey.key_id == key_id)
+        candidate = candidate.limit(1).with_for_update(skip_locked=True).scalar_subquery()
+        
+        claimed = self.db.execute(
+            update(OneTimePreKey)
+            .where(OneTimePreKey.id == candidate, OneTimePreKey.is_used == False)
+            .values(is_used=True, used_at=datetime.now(timezone.utc))
+            .returning(OneTimePreKey.key_id, OneTimePreKey.public_key),
+            execution_options={"synchronize_session": False},
         ).first()
         
-        if not prekey:
-            return None
-        
-        prekey.is_used = True
-        from datetime import datetime, timezone
-        prekey.used_at = datetime.now(timezone.utc)
-        
         self.db.commit()
-        return prekey.public_key
+        return claimed
     
     def get_prekey_count(self, user_id: int) -> int:
         """Get count of available one-time prekeys."""
-        return self.db.query(OneTimePreKey).filter(
+        return self.db.query(func.count(OneTimePreKey.id)).filter(
             OneTimePreKey.user_id == user_id,
             OneTimePreKey.is_used == False
-        ).count()
+        ).scalar()
     
     def add_one_time_prekeys(self, user_id: int, prekeys: list):
         """Add new one-time prekeys for a user."""
@@ -122,13 +132,12 @@ class KeyService:
         
         start_id = (max_key[0] + 1) if max_key else 0
         
-        for idx, pk in enumerate(prekeys):
-            prekey = OneTimePreKey(
-                user_id=user_id,
-                key_id=start_id + idx,
-                public_key=pk
-            )
-            self.db.add(prekey)
+        # One executemany INSERT; no ORM objects are needed for write-only rows
+        if prekeys:
+            self.db.execute(insert(OneTimePreKey), [
+                {"user_id": user_id, "key_id": start_id + idx, "public_key": pk}
+                for idx, pk in enumerate(prekeys)
+            ])
         
         self.db.commit()
         return len(prekeys)
@@ -147,7 +156,6 @@ class KeyService:
         user.signed_prekey = new_signed_prekey
         user.signed_prekey_signature = new_signature
         
-        from datetime import datetime, timezone
         user.signed_prekey_timestamp = datetime.now(timezone.utc)
         
         self.db.commit()
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func, case
+from sqlalchemy import case, or_
 from app.db.message_repo import MessageRepository
 from app.db.user_repo import UserRepository
 from app.db.database import User, CallLog, CallTypeEnum, CallStatusEnum, Message
@@ -12,26 +12,37 @@ class MessageService:
     
     def get_call_history(self, user_id: int):
         """Get call history for a user."""
-        # Query CallLog where caller_id == user_id OR receiver_id == user_id
-        # Order by start_time desc
-        from sqlalchemy import or_
-        
-        calls = self.db.query(CallLog).filter(
-            or_(
-                (CallLog.caller_id == user_id) & (CallLog.caller_deleted == False),
-                (CallLog.receiver_id == user_id) & (CallLog.receiver_deleted == False)
-            )
-        ).order_by(CallLog.start_time.desc()).limit(50).all()
+        # UNION ALL of the caller side and the receiver side, so each branch
+        # is a range scan on its own (participant, start_time) index rather
+        # than one OR across different columns. The receiver branch skips
+        # rows the caller branch already returned (calls to oneself).
+        as_caller = self.db.query(CallLog).filter(
+            CallLog.caller_id == user_id,
+            CallLog.caller_deleted == False
+        )
+        as_receiver = self.db.query(CallLog).filter(
+            CallLog.receiver_id == user_id,
+            CallLog.receiver_deleted == False,
+            or_(CallLog.caller_id != user_id, CallLog.caller_deleted == True)
+        )
+        calls = as_caller.union_all(as_receiver).order_by(CallLog.start_time.desc()).limit(50).all()
         
-        # Add usernames
+        # Add usernames (one lookup for every participant)
+        names = self._usernames_for({c.caller_id for c in calls} | {c.receiver_id for c in calls})
         for call in calls:
-            caller = self.db.query(User).filter(User.id == call.caller_id).first()
-            receiver = self.db.query(User).filter(User.id == call.receiver_id).first()
-            call.caller_username = caller.username if caller else "Unknown"
-            call.receiver_username = receiver.username if receiver else "Unknown"
+            call.caller_username = names.get(call.caller_id, "Unknown")
+            call.receiver_username = names.get(call.receiver_id, "Unknown")
             
         return calls
 
+    def _usernames_for(self, user_ids) -> dict:
+        """Map user id -> username for the given ids in a single query."""
+        if not user_ids:
+            return {}
+        return dict(
+            self.db.query(User.id, User.username).filter(User.id.in_(user_ids)).all()
+        )
+
     def _add_usernames_to_message(self, message):
         """Add sender_username and recipient_username to a message object."""
         sender = self.db.query(User).filter(User.id == message.sender_id).first()
@@ -41,7 +52,7 @@ class MessageService:
         message.sender_username = sender.username if sender else "Unknown"
         message.recipient_username = recipient.username if recipient else "Unknown"
         return message
-    
+
     def send_message(
         self, 
         sender_id: int, 
@@ -77,23 +88,13 @@ class MessageService:
         if not other_user:
             raise ValueError(f"User '{other_username}' not found")
         
-        messages = self.message_repo.get_conversation(user_id, other_user.id)
-        
-        # Add usernames to each message
-        for msg in messages:
-            self._add_usernames_to_message(msg)
-        
-        return messages
+        # Usernames come back joined from the repository query
+        return self.message_repo.get_conversation(user_id, other_user.id)
     
     def get_unread_messages(self, user_id: int):
         """Get all unread messages for a user."""
-        messages = self.message_repo.get_unread_by_recipient(user_id)
-        
-        # Add usernames to each message
-        for msg in messages:
-            self._add_usernames_to_message(msg)
-        
-        return messages
+        # Usernames come back joined from the repository query
+        return self.message_repo.get_unread_by_recipient(user_id)
     
     def mark_as_read(self, message_id: int, user_id: int):
         """Mark a message as read."""
@@ -113,40 +114,18 @@ class MessageService:
         if not peer:
             raise ValueError(f"User '{peer_username}' not found")
         
-        messages = self.message_repo.get_conversation_paginated(user_id, peer.id, limit, offset)
-        
-        # Add usernames to each message
-        for msg in messages:
-            self._add_usernames_to_message(msg)
-        
-        return messages
+        # Usernames come back joined from the repository query
+        return self.message_repo.get_conversation_paginated(user_id, peer.id, limit, offset)
     
     def get_all_conversations_with_messages(self, user_id: int):
         """Get all conversations with recent messages for startup sync."""
-        # Get all unique conversation partners (peer_id is "the other user" in each message)
-        peer_id_expr = case(
-            (Message.sender_id == user_id, Message.recipient_id),
-            else_=Message.sender_id,
-        ).label("peer_id")
-
-        conversations = (
-            self.db.query(peer_id_expr)
-            .filter(or_(Message.sender_id == user_id, Message.recipient_id == user_id))
-            .distinct()
-            .all()
-        )
-
+        # Last 20 messages per peer with both usernames, in one round trip
         result = {}
-        for conv in conversations:
-            peer_id = conv.peer_id
-            peer = self.db.query(User).filter(User.id == peer_id).first()
-            if peer:
-                # Get last 20 messages for this conversation (paginated handles filtering)
-                messages = self.message_repo.get_conversation_paginated(user_id, peer_id, 20, 0)
-                for msg in messages:
-                    self._add_usernames_to_message(msg)
-                
-                result[peer.username] = messages
+        for msg, sender_username, recipient_username in self.message_repo.get_recent_per_peer(user_id, 20):
+            msg.sender_username = sender_username
+            msg.recipient_username = recipient_username
+            peer_username = recipient_username if msg.sender_id == user_id else sender_username
+            result.setdefault(peer_username, []).append(msg)
         
         return result
 
@@ -156,19 +135,19 @@ class MessageService:
         if not peer:
             return False
             
-        # Find calls involving both users
-        calls = self.db.query(CallLog).filter(
+        # Flag only the requesting user's side, in one UPDATE
+        self.db.query(CallLog).filter(
             or_(
                 (CallLog.caller_id == user_id) & (CallLog.receiver_id == peer.id),
                 (CallLog.caller_id == peer.id) & (CallLog.receiver_id == user_id)
             )
-        ).all()
-        
-        for call in calls:
-            if call.caller_id == user_id:
-                call.caller_deleted = True
-            elif call.receiver_id == user_id:
-                call.receiver_deleted = True
+        ).update(
+            {
+                CallLog.caller_deleted: case((CallLog.caller_id == user_id, True), else_=CallLog.caller_deleted),
+                CallLog.receiver_deleted: case((CallLog.caller_id != user_id, True), else_=CallLog.receiver_deleted),
+            },
+            synchronize_session=False,
+        )
                 
         self.db.commit()
         return True
@@ -197,25 +176,24 @@ class MessageService:
         if not peer:
             return False
         
-        # Fetch all messages between both users.
-        messages = self.db.query(Message).filter(
+        # Single bulk statement over every message between both users
+        conversation = self.db.query(Message).filter(
             or_(
                 (Message.sender_id == user_id) & (Message.recipient_id == peer.id),
                 (Message.sender_id == peer.id) & (Message.recipient_id == user_id)
             )
-        ).all()
+        )
 
         if delete_for_everyone:
-            for message in messages:
-                self.db.delete(message)
+            conversation.delete(synchronize_session=False)
         else:
-            for message in messages:
-                if message.sender_id == user_id:
-                    message.sender_deleted = True
-                if message.recipient_id == user_id:
-                    message.recipient_deleted = True
+            conversation.update(
+                {
+                    Message.sender_deleted: case((Message.sender_id == user_id, True), else_=Message.sender_deleted),
+                    Message.recipient_deleted: case((Message.recipient_id == user_id, True), else_=Message.recipient_deleted),
+                },
+                synchronize_session=False,
+            )
         
         self.db.commit()
         return True
-
-
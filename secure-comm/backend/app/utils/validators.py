@@ -1,13 +1,23 @@
 import re
+import string
+from hmac import compare_digest
 from typing import Optional
 
+_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_]{3,20}\Z', re.ASCII)
+
+# Password character classes, checked in one pass over the password
+_UPPER = frozenset(string.ascii_uppercase)
+_LOWER = frozenset(string.ascii_lowercase)
+_SPECIAL = frozenset('!@#$%^&*(),.?":{}|<>')
+_HAS_UPPER, _HAS_LOWER, _HAS_DIGIT, _HAS_SPECIAL = 1, 2, 4, 8
+_HAS_ALL = _HAS_UPPER | _HAS_LOWER | _HAS_DIGIT | _HAS_SPECIAL
+
 def validate_username(username: str) -> bool:
     """
     Validate username format.
     Rules: 3-20 characters, alphanumeric and underscore only.
     """
-    pattern = r'^[a-zA-Z0-9_]{3,20}$'
-    return bool(re.match(pattern, username))
+    return _USERNAME_RE.match(username) is not None
 
 def validate_password_strength(password: str) -> tuple[bool, Optional[str]]:
     """
@@ -17,19 +27,31 @@ def validate_password_strength(password: str) -> tuple[bool, Optional[str]]:
     if len(password) < 8:
         return False, "Password must be at least 8 characters long"
     
-    if not re.search(r'[A-Z]', password):
+    seen = 0
+    for ch in password:
+        if ch in _UPPER:
+            seen |= _HAS_UPPER
+        elif ch in _LOWER:
+            seen |= _HAS_LOWER
+        elif ch.isdecimal():
+            seen |= _HAS_DIGIT
+        elif ch in _SPECIAL:
+            seen |= _HAS_SPECIAL
+        else:
+            continue
+        if seen == _HAS_ALL:
+            return True, None
+    
+    if not seen & _HAS_UPPER:
         return False, "Password must contain at least one uppercase letter"
     
-    if not re.search(r'[a-z]', password):
+    if not seen & _HAS_LOWER:
         return False, "Password must contain at least one lowercase letter"
     
-    if not re.search(r'\d', password):
+    if not seen & _HAS_DIGIT:
         return False, "Password must contain at least one digit"
     
-    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-        return False, "Password must contain at least one special character"
-    
-    return True, None
+    return False, "Password must contain at least one special character"
 
 def validate_public_key(public_key: str) -> bool:
     """
@@ -50,7 +72,17 @@ def sanitize_message_content(content: str, max_length: int = 10000) -> str:
     if len(content) > max_length:
         content = content[:max_length]
     
-    # Remove null bytes and other control characters
-    content = content.replace('\x00', '')
+    # Remove null bytes and other control characters; the membership test is
+    # a memchr scan, far cheaper than replace() on the usual no-match case
+    if '\x00' in content:
+        content = content.replace('\x00', '')
     
     return content.strip()
+
+def secure_eq(a: str, b: str) -> bool:
+    """
+    Constant-time string equality.
+    Use for every hash/token comparison instead of ==, which exits on the
+    first differing byte.
+    """
+    return compare_digest(a.encode(), b.encode())
@@ -6,7 +6,6 @@ Clear all data from production PostgreSQL database.
 import os
 import sys
 from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
 
 def clear_production_database():
     """Clear all data from all tables in the production database."""
@@ -67,58 +66,34 @@ def clear_production_database():
     engine = create_engine(database_url)
     
     with engine.connect() as conn:
-        # Disable foreign key checks temporarily (PostgreSQL uses session_replication_role)
-        print("\nDisabling foreign key constraints...")
-        conn.execute(text("SET session_replication_role = 'replica'"))
-        
-        # Clear each table
         print("\nClearing tables...")
-        for table in tables:
-            try:
-                # Check if table exists
-                result = conn.execute(text(f"""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_name = '{table}'
-                    )
-                """))
-                exists = result.scalar()
-                
-                if exists:
-                    # Get count before deletion
-                    count_result = conn.execute(text(f"SELECT COUNT(*) FROM {table}"))
-                    count = count_result.scalar()
-                    
-                    # Truncate table (faster than DELETE)
-                    conn.execute(text(f"TRUNCATE TABLE {table} CASCADE"))
-                    print(f"  [OK] {table}: Deleted {count} rows")
-                else:
-                    print(f"  [SKIP] {table}: Table does not exist")
-                    
-            except Exception as e:
-                print(f"  ❌ {table}: Error - {e}")
         
-        # Re-enable foreign key constraints
-        conn.execute(text("SET session_replication_role = 'origin'"))
+        # One lookup for which of the listed tables exist
+        existing = {
+            row[0] for row in conn.execute(
+                text("""
+                    SELECT table_name
+                    FROM information_schema.tables
+                    WHERE table_schema = 'public' AND table_name = ANY(:names)
+                """),
+                {"names": tables},
+            )
+        }
+        for table in tables:
+            if table not in existing:
+                print(f"  [SKIP] {table}: Table does not exist")
         
-        # Reset sequences
-        print("\nResetting sequences...")
-        try:
-            sequences = conn.execute(text("""
-                SELECT sequencename 
-                FROM pg_sequences 
-                WHERE schemaname = 'public'
-            """))
-            
-            for seq in sequences.fetchall():
-                seq_name = seq[0]
-                try:
-                    conn.execute(text(f"ALTER SEQUENCE {seq_name} RESTART WITH 1"))
-                    print(f"  [OK] Reset: {seq_name}")
-                except Exception as e:
-                    print(f"  [WARN] {seq_name}: {e}")
-        except Exception as e:
-            print(f"  [WARN] Could not reset sequences: {e}")
+        # Single atomic TRUNCATE: CASCADE covers the foreign keys between them,
+        # RESTART IDENTITY resets the sequences they own
+        if existing:
+            # Identifiers can't be bound; only names from the allowlist above
+            # reach the statement, and they are quoted by the dialect
+            to_clear = [table for table in tables if table in existing]
+            quote = conn.dialect.identifier_preparer.quote
+            table_list = ", ".join(quote(table) for table in to_clear)
+            conn.execute(text(f"TRUNCATE TABLE {table_list} RESTART IDENTITY CASCADE"))
+            for table in to_clear:
+                print(f"  [OK] {table}: Cleared")
         
         conn.commit()
         
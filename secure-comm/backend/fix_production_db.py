@@ -2,84 +2,209 @@
 Fix production PostgreSQL database schema.
 Run this on Render or any PostgreSQL deployment.
 """
+import logging
 import os
 import sys
-import secrets
-from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, text
+
+logger = logging.getLogger(__name__)
+
+# Rows per UPDATE when copying legacy columns; a commit between batches
+# releases row locks so a large table is never locked in one go.
+MIGRATION_BATCH_SIZE = 20000
+
+# Columns added when missing, with their definitions, in the order they
+# are added
+USERS_COLUMNS = {
+    "is_disabled": "BOOLEAN DEFAULT FALSE",
+    "disabled_at": "TIMESTAMP",
+    "deleted_at": "TIMESTAMP",
+    "settings": "JSON",
+    "last_username_change": "TIMESTAMP",
+    "previous_usernames": "JSON",
+}
+
+FRIEND_REQUESTS_COLUMNS = {
+    "sender_id": "INTEGER NOT NULL DEFAULT 1",
+    "sender_public_key_fingerprint": "VARCHAR(64) NOT NULL DEFAULT ''",
+    "receiver_id": "INTEGER NOT NULL DEFAULT 1",
+    "receiver_public_key_fingerprint": "VARCHAR(64)",
+    "encrypted_message": "TEXT",
+    "expires_at": "TIMESTAMP NOT NULL DEFAULT NOW()",
+    "request_nonce": "VARCHAR(64) NOT NULL DEFAULT ''",
+}
+
+# friend_requests columns that replace an old-schema column (new -> old)
+LEGACY_COLUMN_SOURCES = {
+    "sender_id": "from_user_id",
+    "receiver_id": "to_user_id",
+}
+
+# friend_requests constraints added when missing; the nonce backfill must
+# run before uq_friend_requests_nonce
+FRIEND_REQUESTS_CONSTRAINTS = {
+    "fk_friend_requests_sender": "FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE CASCADE",
+    "fk_friend_requests_receiver": "FOREIGN KEY (receiver_id) REFERENCES users(id) ON DELETE CASCADE",
+    "uq_friend_requests_nonce": "UNIQUE (request_nonce)",
+}
+
+# Recorded in schema_migrations once friend_requests matches the model, so
+# later runs skip the catalog checks entirely
+FRIEND_REQUESTS_SCHEMA_VERSION = "friend_requests_v2"
+
+
+def migrate_columns_in_batches(conn, pairs, batch_size=MIGRATION_BATCH_SIZE):
+    """Copy each ``source`` into its ``target`` on friend_requests in id-range batches.
+
+    ``pairs`` maps target to source column. All pairs are copied by the same
+    UPDATE, so each row is rewritten once however many columns it needs.
+    Only targets that are still NULL take their source's value, so re-running
+    the migration is a no-op for populated rows.
+    """
+    if not pairs:
+        return 0
+
+    pending = " OR ".join(
+        f"({target} IS NULL AND {source} IS NOT NULL)" for target, source in pairs.items()
+    )
+    assignments = ", ".join(
+        f"{target} = COALESCE({target}, {source})" for target, source in pairs.items()
+    )
+    bounds = conn.exec_driver_sql(
+        f"SELECT MIN(id), MAX(id) FROM friend_requests WHERE {pending}"
+    ).fetchone()
+    if bounds is None or bounds[0] is None:
+        return 0
+
+    lo, hi = bounds
+    moved = 0
+    while lo <= hi:
+        result = conn.execute(
+            text(
+                f"UPDATE friend_requests SET {assignments} "
+                f"WHERE ({pending}) AND id BETWEEN :lo AND :hi"
+            ),
+            {"lo": lo, "hi": lo + batch_size - 1},
+        )
+        moved += result.rowcount or 0
+        conn.commit()
+        lo += batch_size
+    return moved
+
+
+def get_column_names(conn, table_name):
+    """Column names of ``table_name`` in definition order, in one catalog query.
+
+    Empty when the table does not exist, so this doubles as the existence check.
+    """
+    return [row[0] for row in conn.execute(
+        text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table_name "
+            "ORDER BY ordinal_position"
+        ),
+        {"table_name": table_name},
+    )]
+
+
+def get_constraint_names(conn, table_name):
+    """Names of the constraints on ``table_name``, in one catalog query."""
+    return {row[0] for row in conn.execute(
+        text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table_name)"),
+        {"table_name": table_name},
+    )}
+
+
+def migration_applied(conn, version):
+    """Whether ``version`` is recorded in schema_migrations (created if missing)."""
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version VARCHAR(64) PRIMARY KEY, applied_at TIMESTAMP NOT NULL DEFAULT NOW())"
+    )
+    return conn.execute(
+        text("SELECT 1 FROM schema_migrations WHERE version = :version"),
+        {"version": version},
+    ).first() is not None
+
+
+def mark_migration_applied(conn, version):
+    """Record ``version`` in schema_migrations; a no-op if already there."""
+    conn.execute(
+        text(
+            "INSERT INTO schema_migrations (version) VALUES (:version) "
+            "ON CONFLICT (version) DO NOTHING"
+        ),
+        {"version": version},
+    )
+
+
+def create_indexes_concurrently(engine, statements):
+    """Run CREATE INDEX CONCURRENTLY statements on a dedicated autocommit connection.
+
+    A failure only affects its own index; nothing else is rolled back.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for idx_sql in statements:
+            try:
+                conn.exec_driver_sql(idx_sql)
+                logger.info("  Created: %s", idx_sql)
+            except Exception as e:
+                logger.warning("  Index may already exist: %s", e)
+
 
 def fix_users_table(engine):
     """Add missing columns to users table."""
-    print("\n=== Fixing users table ===")
+    logger.info("\n=== Fixing users table ===")
     
-    with engine.connect() as conn:
-        inspector = inspect(engine)
-        
-        # Check if users table exists
-        tables = inspector.get_table_names()
-        if 'users' not in tables:
-            print("⚠️ Users table does not exist! Will be created by SQLAlchemy.")
+    with engine.begin() as conn:
+        # Get current columns; none at all means the table does not exist
+        columns = get_column_names(conn, 'users')
+        if not columns:
+            logger.warning("⚠️ Users table does not exist! Will be created by SQLAlchemy.")
             return
         
-        # Get current columns
-        columns = {col['name']: col for col in inspector.get_columns('users')}
-        print(f"Current columns: {list(columns.keys())}")
+        logger.info("Current columns: %s", columns)
         
         # Add missing columns
         migrations = []
-        
-        if 'is_disabled' not in columns:
-            migrations.append("ADD COLUMN is_disabled BOOLEAN DEFAULT FALSE")
-            print("-> Will add: is_disabled")
-        
-        if 'disabled_at' not in columns:
-            migrations.append("ADD COLUMN disabled_at TIMESTAMP")
-            print("-> Will add: disabled_at")
-        
-        if 'deleted_at' not in columns:
-            migrations.append("ADD COLUMN deleted_at TIMESTAMP")
-            print("-> Will add: deleted_at")
-        
-        if 'settings' not in columns:
-            migrations.append("ADD COLUMN settings JSON")
-            print("-> Will add: settings")
-        
-        if 'last_username_change' not in columns:
-            migrations.append("ADD COLUMN last_username_change TIMESTAMP")
-            print("-> Will add: last_username_change")
-        
-        if 'previous_usernames' not in columns:
-            migrations.append("ADD COLUMN previous_usernames JSON")
-            print("-> Will add: previous_usernames")
+        for name, definition in USERS_COLUMNS.items():
+            if name not in columns:
+                migrations.append(f"ADD COLUMN {name} {definition}")
+                logger.info("-> Will add: %s", name)
         
         # Execute migrations
         if migrations:
-            print(f"\nExecuting {len(migrations)} migrations on users table...")
-            for migration in migrations:
-                sql = f"ALTER TABLE users {migration}"
-                print(f"  {sql}")
-                try:
-                    conn.execute(text(sql))
-                except Exception as e:
-                    print(f"  Error: {e}")
+            logger.info("\nExecuting %s migrations on users table...", len(migrations))
+            # One multi-action ALTER: a single lock acquisition and round trip
+            sql = "ALTER TABLE users " + ", ".join(migrations)
+            logger.info("  %s", sql)
+            try:
+                with conn.begin_nested():
+                    conn.exec_driver_sql(sql)
+            except Exception as e:
+                logger.warning("  Error: %s", e)
             
-            conn.commit()
-            print("✅ Users table migration completed!")
+            logger.info("✅ Users table migration completed!")
         else:
-            print("✅ All columns already exist in users table.")
+            logger.info("✅ All columns already exist in users table.")
 
 def fix_friend_requests_schema(engine):
     """Fix the friend_requests table schema."""
-    print("\n=== Fixing friend_requests table ===")
+    logger.info("\n=== Fixing friend_requests table ===")
     
-    with engine.connect() as conn:
-        # First check if friend_requests table exists
-        inspector = inspect(engine)
-        tables = inspector.get_table_names()
+    # Schema changes run in one transaction; each "may already exist" step
+    # gets its own SAVEPOINT so a failure there does not abort the rest
+    with engine.begin() as conn:
+        if migration_applied(conn, FRIEND_REQUESTS_SCHEMA_VERSION):
+            logger.info("✅ %s already applied. No migration needed.", FRIEND_REQUESTS_SCHEMA_VERSION)
+            return
+        
+        # Check current schema; no columns means the table does not exist
+        columns = get_column_names(conn, 'friend_requests')
         
-        if 'friend_requests' not in tables:
-            print("friend_requests table does not exist. Creating it...")
-            conn.execute(text("""
+        if not columns:
+            logger.info("friend_requests table does not exist. Creating it...")
+            conn.exec_driver_sql("""
                 CREATE TABLE friend_requests (
                     id SERIAL PRIMARY KEY,
                     sender_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -93,21 +218,18 @@ def fix_friend_requests_schema(engine):
                     expires_at TIMESTAMP NOT NULL DEFAULT (NOW() + INTERVAL '7 days'),
                     request_nonce VARCHAR(64) NOT NULL DEFAULT ''
                 )
-            """))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_requests_sender_id ON friend_requests(sender_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_requests_receiver_id ON friend_requests(receiver_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_requests_status ON friend_requests(status)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_request_sender_receiver ON friend_requests(sender_id, receiver_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_request_pending ON friend_requests(receiver_id, status)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_request_expires ON friend_requests(expires_at, status)"))
-            conn.commit()
-            print("✅ Created friend_requests table with correct schema")
+            """)
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_requests_sender_id ON friend_requests(sender_id)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_requests_receiver_id ON friend_requests(receiver_id)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_requests_status ON friend_requests(status)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_request_sender_receiver ON friend_requests(sender_id, receiver_id)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_request_pending ON friend_requests(receiver_id, status)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_request_expires ON friend_requests(expires_at, status)")
+            mark_migration_applied(conn, FRIEND_REQUESTS_SCHEMA_VERSION)
+            logger.info("✅ Created friend_requests table with correct schema")
             return
         
-        # Check current schema
-        columns = {col['name']: col for col in inspector.get_columns('friend_requests')}
-        
-        print(f"Current columns: {list(columns.keys())}")
+        logger.info("Current columns: %s", columns)
         
         # Check if schema is completely incompatible (no sender_id AND no from_user_id)
         # This means the table was created with a very different schema
@@ -115,10 +237,15 @@ def fix_friend_requests_schema(engine):
         has_any_essential = any(col in columns for col in essential_columns)
         
         if not has_any_essential and len(columns) > 1:
-            print("⚠️ Table exists with incompatible schema. Dropping and recreating...")
+            if os.getenv("ALLOW_DESTRUCTIVE_MIGRATION") != "1":
+                raise RuntimeError(
+                    "friend_requests has an incompatible schema; set "
+                    "ALLOW_DESTRUCTIVE_MIGRATION=1 to drop and recreate it"
+                )
+            logger.warning("⚠️ Table exists with incompatible schema. Dropping and recreating...")
             # First, drop old data (this is a clean slate approach)
-            conn.execute(text("DROP TABLE friend_requests CASCADE"))
-            conn.execute(text("""
+            conn.exec_driver_sql("DROP TABLE friend_requests CASCADE")
+            conn.exec_driver_sql("""
                 CREATE TABLE friend_requests (
                     id SERIAL PRIMARY KEY,
                     sender_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -132,196 +259,203 @@ def fix_friend_requests_schema(engine):
                     expires_at TIMESTAMP NOT NULL DEFAULT (NOW() + INTERVAL '7 days'),
                     request_nonce VARCHAR(64) NOT NULL DEFAULT ''
                 )
-            """))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_requests_sender_id ON friend_requests(sender_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_requests_receiver_id ON friend_requests(receiver_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_requests_status ON friend_requests(status)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_request_sender_receiver ON friend_requests(sender_id, receiver_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_request_pending ON friend_requests(receiver_id, status)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_friend_request_expires ON friend_requests(expires_at, status)"))
-            conn.commit()
-            print("✅ Recreated friend_requests table with correct schema")
+            """)
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_requests_sender_id ON friend_requests(sender_id)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_requests_receiver_id ON friend_requests(receiver_id)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_requests_status ON friend_requests(status)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_request_sender_receiver ON friend_requests(sender_id, receiver_id)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_request_pending ON friend_requests(receiver_id, status)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_friend_request_expires ON friend_requests(expires_at, status)")
+            mark_migration_applied(conn, FRIEND_REQUESTS_SCHEMA_VERSION)
+            logger.info("✅ Recreated friend_requests table with correct schema")
             return
         
         # Check for old column names that need to be migrated
-        has_old_schema = 'from_user_id' in columns or 'to_user_id' in columns
+        has_old_schema = any(source in columns for source in LEGACY_COLUMN_SOURCES.values())
         
-        # Add missing columns
+        # Add missing columns. Columns replacing a legacy one are added
+        # nullable and filled from it below instead of taking the default.
         migrations = []
-        
-        if 'sender_id' not in columns:
-            if 'from_user_id' in columns:
-                # Rename old column
-                migrations.append("ADD COLUMN sender_id INTEGER")
-                print("-> Will add: sender_id (will migrate from from_user_id)")
-            else:
-                migrations.append("ADD COLUMN sender_id INTEGER NOT NULL DEFAULT 1")
-                print("-> Will add: sender_id")
-        
-        if 'sender_public_key_fingerprint' not in columns:
-            migrations.append("ADD COLUMN sender_public_key_fingerprint VARCHAR(64) NOT NULL DEFAULT ''")
-            print("-> Will add: sender_public_key_fingerprint")
-        
-        if 'receiver_id' not in columns:
-            if 'to_user_id' in columns:
-                # Rename old column
-                migrations.append("ADD COLUMN receiver_id INTEGER")
-                print("-> Will add: receiver_id (will migrate from to_user_id)")
+        for name, definition in FRIEND_REQUESTS_COLUMNS.items():
+            if name in columns:
+                continue
+            legacy = LEGACY_COLUMN_SOURCES.get(name)
+            if legacy in columns:
+                migrations.append(f"ADD COLUMN {name} INTEGER")
+                logger.info("-> Will add: %s (will migrate from %s)", name, legacy)
             else:
-                migrations.append("ADD COLUMN receiver_id INTEGER NOT NULL DEFAULT 1")
-                print("-> Will add: receiver_id")
-        
-        if 'receiver_public_key_fingerprint' not in columns:
-            migrations.append("ADD COLUMN receiver_public_key_fingerprint VARCHAR(64)")
-            print("-> Will add: receiver_public_key_fingerprint")
-        
-        if 'encrypted_message' not in columns:
-            migrations.append("ADD COLUMN encrypted_message TEXT")
-            print("-> Will add: encrypted_message")
-        
-        if 'expires_at' not in columns:
-            migrations.append("ADD COLUMN expires_at TIMESTAMP NOT NULL DEFAULT NOW()")
-            print("-> Will add: expires_at")
-        
-        if 'request_nonce' not in columns:
-            migrations.append("ADD COLUMN request_nonce VARCHAR(64) NOT NULL DEFAULT ''")
-            print("-> Will add: request_nonce")
+                migrations.append(f"ADD COLUMN {name} {definition}")
+                logger.info("-> Will add: %s", name)
         
         # Execute migrations
         if migrations:
-            print(f"\nExecuting {len(migrations)} migrations...")
-            for migration in migrations:
-                sql = f"ALTER TABLE friend_requests {migration}"
-                print(f"  {sql}")
-                conn.execute(text(sql))
-            
-            # Create indexes
-            print("\nCreating indexes...")
-            indexes = [
-                "CREATE INDEX IF NOT EXISTS ix_friend_requests_sender_id ON friend_requests(sender_id)",
-                "CREATE INDEX IF NOT EXISTS ix_friend_requests_receiver_id ON friend_requests(receiver_id)",
-                "CREATE INDEX IF NOT EXISTS ix_friend_requests_expires_at ON friend_requests(expires_at)",
-                "CREATE INDEX IF NOT EXISTS ix_friend_request_sender_receiver ON friend_requests(sender_id, receiver_id)",
-                "CREATE INDEX IF NOT EXISTS ix_friend_request_pending ON friend_requests(receiver_id, status)",
-                "CREATE INDEX IF NOT EXISTS ix_friend_request_expires ON friend_requests(expires_at, status)",
-            ]
-            
-            for idx_sql in indexes:
-                try:
-                    conn.execute(text(idx_sql))
-                    print(f"  Created: {idx_sql}")
-                except Exception as e:
-                    print(f"  Index may already exist: {e}")
-            
-            # Add foreign keys
-            print("\nAdding foreign keys...")
-            try:
-                conn.execute(text("""
-                    ALTER TABLE friend_requests 
-                    ADD CONSTRAINT fk_friend_requests_sender 
-                    FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE CASCADE
-                """))
-                print("  Added FK: sender_id -> users.id")
-            except Exception as e:
-                print(f"  FK may already exist: {e}")
-            
-            try:
-                conn.execute(text("""
-                    ALTER TABLE friend_requests 
-                    ADD CONSTRAINT fk_friend_requests_receiver 
-                    FOREIGN KEY (receiver_id) REFERENCES users(id) ON DELETE CASCADE
-                """))
-                print("  Added FK: receiver_id -> users.id")
-            except Exception as e:
-                print(f"  FK may already exist: {e}")
-            
-            # Add unique constraint on request_nonce
+            logger.info("\nExecuting %s migrations...", len(migrations))
+            # One multi-action ALTER: a single lock acquisition and round trip
+            sql = "ALTER TABLE friend_requests " + ", ".join(migrations)
+            logger.info("  %s", sql)
+            conn.exec_driver_sql(sql)
+        
+        # The nonce backfill and the constraints run on every run that has not
+        # been recorded yet, so a step that failed last time is retried
+        
+        # Generate nonces for existing rows before request_nonce becomes
+        # UNIQUE; rows left at the '' default would collide
+        logger.info("\nGenerating request_nonces for existing rows...")
+        try:
+            with conn.begin_nested():
+                # Nonces are generated by PostgreSQL itself (pgcrypto), so the
+                # whole backfill is one statement with no rows sent back and forth
+                conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pgcrypto")
+                result = conn.exec_driver_sql(
+                    "UPDATE friend_requests SET request_nonce = encode(gen_random_bytes(32), 'hex') "
+                    "WHERE request_nonce = '' OR request_nonce IS NULL"
+                )
+            logger.info("  Generated nonces for %s rows", result.rowcount)
+        except Exception as e:
+            logger.warning("  Warning during nonce generation: %s", e)
+        
+        # Add the foreign keys and the request_nonce unique constraint
+        # that are not there yet, in one ALTER
+        logger.info("\nAdding constraints...")
+        constraints_ok = True
+        existing = get_constraint_names(conn, 'friend_requests')
+        missing_constraints = [name for name in FRIEND_REQUESTS_CONSTRAINTS if name not in existing]
+        if missing_constraints:
+            sql = "ALTER TABLE friend_requests " + ", ".join(
+                f"ADD CONSTRAINT {name} {FRIEND_REQUESTS_CONSTRAINTS[name]}" for name in missing_constraints
+            )
             try:
-                conn.execute(text("""
-                    ALTER TABLE friend_requests 
-                    ADD CONSTRAINT uq_friend_requests_nonce 
-                    UNIQUE (request_nonce)
-                """))
-                print("  Added unique constraint: request_nonce")
+                with conn.begin_nested():
+                    conn.exec_driver_sql(sql)
+                for name in missing_constraints:
+                    logger.info("  Added constraint: %s", name)
             except Exception as e:
-                print(f"  Unique constraint may already exist: {e}")
-            
-            # Migrate data from old columns if they exist
-            if has_old_schema:
-                print("\nMigrating data from old columns...")
-                try:
-                    conn.execute(text("""
-                        UPDATE friend_requests 
-                        SET sender_id = from_user_id,
-                            receiver_id = to_user_id
-                        WHERE from_user_id IS NOT NULL AND to_user_id IS NOT NULL
-                    """))
-                    print("  Migrated: from_user_id -> sender_id, to_user_id -> receiver_id")
-                except Exception as e:
-                    print(f"  Warning during data migration: {e}")
-            
-            # Generate nonces for existing rows
-            print("\nGenerating request_nonces for existing rows...")
+                constraints_ok = False
+                logger.warning("  Could not add constraints: %s", e)
+        else:
+            logger.info("  All constraints already exist")
+    
+    # Migrate data from old columns while they exist, including when an
+    # earlier run added the new columns but the copy failed. This commits
+    # between batches, so it runs after the schema transaction on its own
+    # connection
+    data_ok = True
+    if has_old_schema:
+        logger.info("\nMigrating data from old columns...")
+        with engine.connect() as conn:
             try:
-                result = conn.execute(text("SELECT id FROM friend_requests WHERE request_nonce = '' OR request_nonce IS NULL"))
-                rows = result.fetchall()
-                for row in rows:
-                    nonce = secrets.token_hex(32)
-                    conn.execute(
-                        text("UPDATE friend_requests SET request_nonce = :nonce WHERE id = :id"),
-                        {"nonce": nonce, "id": row[0]}
+                pairs = {
+                    target: source
+                    for target, source in LEGACY_COLUMN_SOURCES.items()
+                    if source in columns
+                }
+                moved = migrate_columns_in_batches(conn, pairs)
+                for target, source in pairs.items():
+                    logger.info("  Migrated: %s -> %s", source, target)
+                logger.info("  Updated %s rows", moved)
+                
+                # Every value has been copied, so the legacy columns can go;
+                # the app refuses to start while they are still there. Under
+                # the table lock, rows written since the last batch are
+                # copied first so nothing is lost with the drop
+                logger.info("\nDropping legacy columns...")
+                conn.commit()
+                with conn.begin():
+                    conn.exec_driver_sql("LOCK TABLE friend_requests IN ACCESS EXCLUSIVE MODE")
+                    conn.exec_driver_sql(
+                        "UPDATE friend_requests SET "
+                        + ", ".join(f"{target} = COALESCE({target}, {source})" for target, source in pairs.items())
+                        + " WHERE "
+                        + " OR ".join(f"({target} IS NULL AND {source} IS NOT NULL)" for target, source in pairs.items())
                     )
-                print(f"  Generated nonces for {len(rows)} rows")
+                    conn.exec_driver_sql(
+                        "ALTER TABLE friend_requests "
+                        + ", ".join(f"DROP COLUMN {source}" for source in pairs.values())
+                    )
+                for source in pairs.values():
+                    logger.info("  Dropped: %s", source)
             except Exception as e:
-                print(f"  Warning during nonce generation: {e}")
-            
-            conn.commit()
-            print("\n✅ Database migration completed successfully!")
-        else:
-            print("\n✅ All columns already exist. No migration needed.")
+                conn.rollback()
+                data_ok = False
+                logger.warning("  Warning during data migration: %s", e)
+    
+    if not migrations:
+        logger.info("\n✅ All columns already exist. No migration needed.")
+    else:
+        # Built CONCURRENTLY so friend_requests stays writable; each one
+        # needs its own autocommit statement (not allowed in a transaction,
+        # including a multi-statement string)
+        logger.info("\nCreating indexes...")
+        create_indexes_concurrently(engine, [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_friend_requests_sender_id ON friend_requests(sender_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_friend_requests_receiver_id ON friend_requests(receiver_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_friend_requests_expires_at ON friend_requests(expires_at)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_friend_request_sender_receiver ON friend_requests(sender_id, receiver_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_friend_request_pending ON friend_requests(receiver_id, status)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_friend_request_expires ON friend_requests(expires_at, status)",
+        ])
+        logger.info("\n✅ Database migration completed successfully!")
+    
+    with engine.begin() as conn:
+        if migrations:
+            # Refresh planner statistics so the first queries after the
+            # migration see the new sender_id/receiver_id/expires_at data
+            conn.exec_driver_sql("ANALYZE friend_requests")
         
         # Verify final schema
-        inspector = inspect(engine)  # Refresh inspector
-        columns = {col['name']: col for col in inspector.get_columns('friend_requests')}
-        print(f"\nFinal columns: {list(columns.keys())}")
+        columns = get_column_names(conn, 'friend_requests')
+        logger.info("\nFinal columns: %s", columns)
         
         # Verify all required columns exist
         required_columns = ['id', 'sender_id', 'receiver_id', 'status', 'created_at', 'expires_at', 'request_nonce']
         missing = [col for col in required_columns if col not in columns]
         if missing:
-            print(f"⚠️ WARNING: Still missing columns: {missing}")
+            logger.warning("⚠️ WARNING: Still missing columns: %s", missing)
+        elif not (data_ok and constraints_ok):
+            # Left unrecorded so the next run retries the failed steps
+            logger.warning("⚠️ WARNING: Data copy or constraints incomplete; will retry on next run")
         else:
-            print("✅ All required columns verified!")
+            mark_migration_applied(conn, FRIEND_REQUESTS_SCHEMA_VERSION)
+            logger.info("✅ All required columns verified!")
+
+def run_migrations(database_url):
+    """Apply the users and friend_requests fixes against ``database_url``.
+
+    Importable so callers such as run_with_migration.py can migrate in-process.
+    """
+    # Convert asyncpg URL to psycopg2 if needed
+    if database_url.startswith("postgresql+asyncpg://"):
+        database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    elif database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    
+    logger.info("Connecting to database...")
+    engine = create_engine(database_url)
+    try:
+        # Fix users table
+        fix_users_table(engine)
+        
+        # Fix friend_requests table
+        fix_friend_requests_schema(engine)
+    finally:
+        engine.dispose()
+
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     try:
         # Get database URL
         database_url = os.getenv("DATABASE_URL")
         if not database_url:
-            print("ERROR: DATABASE_URL not set")
+            logger.error("ERROR: DATABASE_URL not set")
             sys.exit(1)
         
-        # Convert asyncpg URL to psycopg2 if needed
-        if database_url.startswith("postgresql+asyncpg://"):
-            database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        elif database_url.startswith("postgres://"):
-            database_url = database_url.replace("postgres://", "postgresql://", 1)
-        
-        print(f"Connecting to database...")
-        engine = create_engine(database_url)
-        
-        # Fix users table
-        fix_users_table(engine)
-        
-        # Fix friend_requests table
-        fix_friend_requests_schema(engine)
+        run_migrations(database_url)
         
-        print("\n" + "="*60)
-        print("✅ ALL DATABASE MIGRATIONS COMPLETED SUCCESSFULLY!")
-        print("="*60)
+        logger.info("\n" + "="*60)
+        logger.info("✅ ALL DATABASE MIGRATIONS COMPLETED SUCCESSFULLY!")
+        logger.info("="*60)
         
     except Exception as e:
-        print(f"\n❌ ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("\n❌ ERROR: %s", e)
         sys.exit(1)
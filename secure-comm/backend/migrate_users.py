@@ -32,6 +32,11 @@ def migrate():
             ("previous_usernames", "JSON"),
         ]
 
+        # sqlite3 does not open a transaction for DDL on its own, so each
+        # ALTER would otherwise commit (and sync the journal) separately and
+        # the rollback below would have nothing to undo
+        cursor.execute("BEGIN IMMEDIATE")
+
         failures: list[str] = []
         for col_name, col_type in new_columns:
             if col_name not in columns:
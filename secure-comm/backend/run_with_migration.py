@@ -3,36 +3,37 @@
 Run the FastAPI server with automatic database migration on startup.
 This ensures the database schema is always up to date.
 """
+import logging
 import os
-import sys
-import subprocess
+import runpy
 
-# Run database migration first
+# fix_production_db reports through logging; show its INFO lines as before
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+# Run database migration first, in this interpreter rather than a child one
 print("="*60)
 print("Running database migration...")
 print("="*60)
 
 try:
-    result = subprocess.run(
-        [sys.executable, "fix_production_db.py"],
-        capture_output=True,
-        text=True,
-        check=True
-    )
-    print(result.stdout)
-    if result.stderr:
-        print(result.stderr)
-except subprocess.CalledProcessError as e:
-    print(f"Migration failed: {e}")
-    print(e.stdout)
-    print(e.stderr)
-    # Continue anyway - the app might still work
-except FileNotFoundError:
+    import fix_production_db
+except ImportError:
+    fix_production_db = None
     print("fix_production_db.py not found, skipping migration")
 
+database_url = os.getenv("DATABASE_URL")
+if fix_production_db is not None and not database_url:
+    print("DATABASE_URL not set, skipping migration")
+elif fix_production_db is not None:
+    try:
+        fix_production_db.run_migrations(database_url)
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        # Continue anyway - the app might still work
+
 print("="*60)
 print("Starting server...")
 print("="*60)
 
 # Run the server
-os.execvp(sys.executable, [sys.executable, "run.py"])
+runpy.run_path("run.py", run_name="__main__")
@@ -2,34 +2,54 @@
 Basic tests for CipherLink Backend
 """
 
+from unittest.mock import patch
+
+import httpx
 import pytest
-from fastapi.testclient import TestClient
+import pytest_asyncio
 from app.main import app
 
-client = TestClient(app)
+# Tests share the module's event loop so they can share its client
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def client():
+    """One async client, and one app startup/shutdown, for the module
+
+    ASGITransport does not send lifespan events, so the app's lifespan is
+    entered around it. localhost is in the default ALLOWED_HOSTS. Dependency
+    overrides installed by other test modules are set aside so requests use
+    the database the lifespan just prepared.
+    """
+    with patch.dict(app.dependency_overrides, clear=True):
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as c:
+                yield c
 
 
-def test_root_endpoint():
+async def test_root_endpoint(client):
     """Test the root endpoint returns correct status"""
-    response = client.get("/")
+    response = await client.get("/")
     assert response.status_code == 200
     data = response.json()
-    assert data["name"] == "CipherLink API"
+    assert data["name"] == "ZeroTrace API"
     assert data["status"] == "running"
     assert "version" in data
 
 
-def test_health_check():
+async def test_health_check(client):
     """Test health check endpoint"""
-    response = client.get("/health")
+    response = await client.get("/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
 
 
-def test_security_info():
+async def test_security_info(client):
     """Test security information endpoint"""
-    response = client.get("/api/security-info")
+    response = await client.get("/api/security-info")
     assert response.status_code == 200
     data = response.json()
     assert "encryption" in data
@@ -38,9 +58,9 @@ def test_security_info():
     assert data["features"]["forward_secrecy"] is True
 
 
-def test_register_user():
+async def test_register_user(client):
     """Test user registration"""
-    response = client.post(
+    response = await client.post(
         "/api/auth/register",
         json={
             "username": "testuser123",
@@ -54,19 +74,19 @@ def test_register_user():
     assert response.status_code in [201, 400]
 
 
-def test_docs_accessible():
+async def test_docs_accessible(client):
     """Test that API documentation is accessible"""
-    response = client.get("/docs")
+    response = await client.get("/docs")
     assert response.status_code == 200
     
-    response = client.get("/redoc")
+    response = await client.get("/redoc")
     assert response.status_code == 200
 
 
-def test_openapi_schema():
+async def test_openapi_schema(client):
     """Test OpenAPI schema is available"""
-    response = client.get("/openapi.json")
+    response = await client.get("/openapi.json")
     assert response.status_code == 200
     schema = response.json()
     assert "info" in schema
-    assert schema["info"]["title"] == "CipherLink API"
+    assert schema["info"]["title"] == "ZeroTrace API"
@@ -8,16 +8,27 @@ import os
 import sys
 import subprocess
 import json
+import shutil
+import concurrent.futures
 import secrets
 from pathlib import Path
 
-def run_command(cmd, cwd=None, check=True):
-    """Run shell command with error handling"""
-    print(f"🔧 Running: {cmd}")
+def run_command(cmd, cwd=None, check=True, shell=None):
+    """Run command with error handling
+
+    A list is executed directly, without an intermediate /bin/sh; a string
+    still goes through the shell unless ``shell`` says otherwise.
+    """
+    if shell is None:
+        shell = isinstance(cmd, str)
+    print(f"🔧 Running: {cmd if shell else ' '.join(map(str, cmd))}")
+    if not shell and os.path.basename(cmd[0]) == cmd[0]:
+        # Resolve bare names on PATH ourselves (finds npm.cmd etc. on Windows)
+        cmd = [shutil.which(cmd[0]) or cmd[0], *cmd[1:]]
     try:
         result = subprocess.run(
             cmd, 
-            shell=True, 
+            shell=shell, 
             cwd=cwd, 
             check=check,
             capture_output=True,
@@ -33,31 +44,37 @@ def run_command(cmd, cwd=None, check=True):
         if check:
             sys.exit(1)
         return e
+    except FileNotFoundError as e:
+        # Without a shell there is no exit status 127 for a missing program
+        print(f"❌ Error: {e}")
+        if check:
+            sys.exit(1)
+        return subprocess.CompletedProcess(cmd, 127, "", str(e))
 
 def check_requirements():
     """Check if required tools are installed"""
     print("🔍 Checking requirements...")
     
-    requirements = {
-        'python3': 'python3 --version',
-        'node': 'node --version',
-        'npm': 'npm --version',
-        'git': 'git --version',
-    }
-    
-    missing = []
-    for tool, cmd in requirements.items():
-        result = run_command(cmd, check=False)
-        if result.returncode != 0:
-            missing.append(tool)
-        else:
-            print(f"✅ {tool}: {result.stdout.strip()}")
+    tools = ['python3', 'node', 'npm', 'git']
+    
+    # A PATH lookup finds missing tools without spawning anything
+    paths = {tool: shutil.which(tool) for tool in tools}
+    missing = [tool for tool, path in paths.items() if path is None]
     
     if missing:
         print(f"❌ Missing requirements: {', '.join(missing)}")
         print("Please install the missing tools and run setup again.")
         sys.exit(1)
     
+    # Ask every tool for its version at once rather than one after another
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(tools)) as executor:
+        results = executor.map(
+            lambda path: subprocess.run([path, '--version'], capture_output=True, text=True),
+            paths.values(),
+        )
+        for tool, result in zip(paths, results):
+            print(f"✅ {tool}: {result.stdout.strip()}")
+    
     print("✅ All requirements satisfied!")
 
 def setup_backend():
@@ -68,18 +85,22 @@ def setup_backend():
     
     # Create virtual environment
     if not (backend_dir / "venv").exists():
-        run_command("python3 -m venv venv", cwd=backend_dir)
+        run_command(["python3", "-m", "venv", "venv"], cwd=backend_dir)
     
     # Activate venv and install dependencies
+    # Absolute paths: without a shell, a relative program path is not
+    # resolved against cwd on every platform
     if os.name == 'nt':  # Windows
-        pip_cmd = "venv\\Scripts\\pip"
-        python_cmd = "venv\\Scripts\\python"
+        pip_cmd = str(backend_dir.resolve() / "venv" / "Scripts" / "pip")
+        python_cmd = str(backend_dir.resolve() / "venv" / "Scripts" / "python")
     else:  # Unix/Linux/macOS
-        pip_cmd = "venv/bin/pip"
-        python_cmd = "venv/bin/python"
+        pip_cmd = str(backend_dir.resolve() / "venv" / "bin" / "pip")
+        python_cmd = str(backend_dir.resolve() / "venv" / "bin" / "python")
     
-    run_command(f"{pip_cmd} install --upgrade pip", cwd=backend_dir)
-    run_command(f"{pip_cmd} install -r requirements.txt", cwd=backend_dir)
+    # wheel lets pip build and cache any sdist-only package once;
+    # --prefer-binary picks a published wheel over a newer sdist
+    run_command([pip_cmd, "install", "--upgrade", "pip", "wheel", "setuptools"], cwd=backend_dir)
+    run_command([pip_cmd, "install", "--prefer-binary", "-r", "requirements.txt"], cwd=backend_dir)
     
     # Generate secret key
     secret_key = secrets.token_urlsafe(32)
@@ -107,7 +128,7 @@ def setup_web_client():
     web_dir = Path("secure-comm/web-client")
     
     # Install dependencies
-    run_command("npm install", cwd=web_dir)
+    run_command(["npm", "install"], cwd=web_dir)
     
     # Create .env.local
     env_content = """# ZeroTrace Web Client Configuration
@@ -132,13 +153,13 @@ def setup_mobile_app():
         return
     
     # Install dependencies
-    run_command("npm install", cwd=mobile_dir)
+    run_command(["npm", "install"], cwd=mobile_dir)
     
     # Install iOS pods (if on macOS)
     if sys.platform == "darwin":
         ios_dir = mobile_dir / "ios"
         if ios_dir.exists():
-            run_command("pod install", cwd=ios_dir)
+            run_command(["pod", "install"], cwd=ios_dir)
     
     print("✅ Mobile app setup complete!")
 
@@ -149,9 +170,9 @@ def setup_database():
     backend_dir = Path("secure-comm/backend")
     
     if os.name == 'nt':  # Windows
-        python_cmd = "venv\\Scripts\\python"
+        python_cmd = str(backend_dir.resolve() / "venv" / "Scripts" / "python")
     else:  # Unix/Linux/macOS
-        python_cmd = "venv/bin/python"
+        python_cmd = str(backend_dir.resolve() / "venv" / "bin" / "python")
     
     # Run database initialization
     init_script = """
@@ -165,7 +186,7 @@ print("✅ Database tables created!")
     with open(backend_dir / "init_db.py", "w") as f:
         f.write(init_script)
     
-    run_command(f"{python_cmd} init_db.py", cwd=backend_dir)
+    run_command([python_cmd, "init_db.py"], cwd=backend_dir)
     
     # Clean up
     os.remove(backend_dir / "init_db.py")
@@ -235,8 +256,17 @@ def create_docker_setup():
     docker_compose = """version: '3.8'
 
 services:
+  # Builds pull layer cache from the registry when it is reachable (and carry
+  # on without it otherwise). CI refreshes it with:
+  #   docker buildx bake -f docker-compose.yml --push \\
+  #     --set backend.cache-to=type=registry,ref=zerotrace/backend:cache,mode=max \\
+  #     --set web.cache-to=type=registry,ref=zerotrace/web:cache,mode=max
   backend:
-    build: ./secure-comm/backend
+    image: zerotrace/backend
+    build:
+      context: ./secure-comm/backend
+      cache_from:
+        - type=registry,ref=zerotrace/backend:cache
     ports:
       - "8000:8000"
     environment:
@@ -249,7 +279,11 @@ services:
     command: uvicorn app.main:app --host 0.0.0.0 --port 8000
 
   web:
-    build: ./secure-comm/web-client
+    image: zerotrace/web
+    build:
+      context: ./secure-comm/web-client
+      cache_from:
+        - type=registry,ref=zerotrace/web:cache
     ports:
       - "3000:3000"
     environment:
@@ -257,9 +291,6 @@ services:
       - NEXT_PUBLIC_WS_URL=ws://localhost:8000/ws
     depends_on:
       - backend
-    volumes:
-      - ./secure-comm/web-client:/app
-      - /app/node_modules
 
   db:
     image: postgres:15
@@ -288,12 +319,32 @@ volumes:
         f.write(docker_compose)
     
     # Backend Dockerfile
-    backend_dockerfile = """FROM python:3.11-slim
+    # BuildKit cache mounts keep pip's and npm's download caches across
+    # builds, even when the dependency layer itself is invalidated.
+    # Dependencies are built into wheels in a separate stage that depends only
+    # on requirements.txt, so source edits reuse the cached dependency layers
+    backend_dockerfile = """# syntax=docker/dockerfile:1.7
+FROM python:3.11-slim AS builder
 
-WORKDIR /app
+# Toolchain for any dependency without a prebuilt wheel; installed and
+# cleaned in one layer, and never copied into the runtime stage
+RUN apt-get update \\
+    && apt-get install -y --no-install-recommends build-essential libffi-dev \\
+    && rm -rf /var/lib/apt/lists/*
+
+WORKDIR /wheels
 
 COPY requirements.txt .
-RUN pip install --no-cache-dir -r requirements.txt
+RUN --mount=type=cache,target=/root/.cache/pip \\
+    pip wheel --wheel-dir /wheels -r requirements.txt
+
+FROM python:3.11-slim AS runtime
+
+WORKDIR /app
+
+COPY --from=builder /wheels /wheels
+RUN pip install --no-cache-dir --no-index --find-links=/wheels -r /wheels/requirements.txt \\
+    && rm -rf /wheels
 
 COPY . .
 
@@ -307,19 +358,39 @@ CMD ["uvicorn", "app.main:app", "--host", "0.0.0.0", "--port", "8000"]
         f.write(backend_dockerfile)
     
     # Web Dockerfile
-    web_dockerfile = """FROM node:18-alpine
+    # The build needs devDependencies (TypeScript, the Next compiler); the
+    # runner stage only gets Next's standalone server output
+    web_dockerfile = """# syntax=docker/dockerfile:1.7
+FROM node:18-alpine AS deps
 
 WORKDIR /app
 
 COPY package*.json ./
-RUN npm ci --only=production
+RUN --mount=type=cache,target=/root/.npm \\
+    npm ci
+
+FROM node:18-alpine AS builder
 
+WORKDIR /app
+
+COPY --from=deps /app/node_modules ./node_modules
 COPY . .
 RUN npm run build
 
+FROM node:18-alpine AS runner
+
+WORKDIR /app
+
+ENV NODE_ENV=production
+ENV PORT=3000
+ENV HOSTNAME=0.0.0.0
+
+COPY --from=builder /app/.next/standalone ./
+COPY --from=builder /app/.next/static ./.next/static
+
 EXPOSE 3000
 
-CMD ["npm", "start"]
+CMD ["node", "server.js"]
 """
     
     web_dir = Path("secure-comm/web-client")
@@ -372,10 +443,20 @@ def main():
     
     try:
         check_requirements()
-        setup_backend()
-        setup_web_client()
-        setup_mobile_app()
-        setup_database()
+        
+        # The installers only wait on pip/npm, so run them side by side;
+        # the database step needs the backend venv and waits for it alone
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+            backend = executor.submit(setup_backend)
+            clients = [
+                executor.submit(setup_web_client),
+                executor.submit(setup_mobile_app),
+            ]
+            backend.result()
+            setup_database()
+            for future in clients:
+                future.result()
+        
         create_run_scripts()
         create_docker_setup()
         print_completion_message()
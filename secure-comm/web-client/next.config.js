@@ -1,6 +1,8 @@
 /** @type {import('next').NextConfig} */
 const nextConfig = {
   reactStrictMode: true,
+  // Self-contained server in .next/standalone for the Docker runner stage
+  output: 'standalone',
   async rewrites() {
     // Only proxy to localhost in development; on Vercel the frontend
     // talks directly to the Render backend via NEXT_PUBLIC_API_URL